@@ -1,15 +1,59 @@
-from flask import Flask, render_template, request, jsonify, make_response
+from flask import Flask, render_template, request, jsonify, make_response, Response, stream_with_context, g, send_file
 import requests
+from requests.adapters import HTTPAdapter
+import os
+import re
+import sys
+import hmac
+import random
+import cProfile
+import io
+import csv
+import bisect
+import itertools
+import heapq
+import gzip
+import tempfile
+import hashlib
+import threading
+import _thread
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import time
 import json
+from collections import OrderedDict
 from flask_cors import CORS
 from flask_caching import Cache
+from xml.sax.saxutils import escape as xml_escape, quoteattr
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # opcional: proyecciones con productos de matrices dispersas
+    np = None
+    sparse = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # opcional: solo se usa para exportar a Parquet
+    pa = None
+    pq = None
+
+try:
+    from gevent import monkey as gevent_monkey
+    import greenlet
+    GEVENT_PATCHED = gevent_monkey.is_module_patched('threading')
+except ImportError:  # opcional: solo con GUNICORN_WORKER_CLASS=gevent
+    gevent_monkey = None
+    greenlet = None
+    GEVENT_PATCHED = False
 
 app = Flask(__name__)
 CORS(app)
 
 # ==================== CONFIGURACIÓN DE REDIS ====================
-app.config['CACHE_TYPE'] = 'redis'
+app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'redis')  # p. ej. SimpleCache para benchmarks locales
 app.config['CACHE_REDIS_HOST'] = 'localhost'
 app.config['CACHE_REDIS_PORT'] = 6379
 app.config['CACHE_REDIS_DB'] = 0
@@ -19,8 +63,255 @@ app.config['CACHE_KEY_PREFIX'] = 'musicevents_'
 cache = Cache(app)
 # ================================================================
 
-API_BASE_URL = "http://basedeconciertos.uahurtado.cl/api"
-PARAMS_URL = "http://basedeconciertos.uahurtado.cl/api/status/get_params"
+API_BASE_URL = os.environ.get('API_BASE_URL', "http://basedeconciertos.uahurtado.cl/api")
+PARAMS_URL = f"{API_BASE_URL}/status/get_params"
+
+# ==================== CLIENTE HTTP HACIA LA API EXTERNA ====================
+# Una sola sesión compartida por proceso. Con workers gevent (ver gunicorn.conf.py)
+# cada request HTTP cede el control mientras espera a la API externa, así que el
+# pool debe ser lo bastante grande para cientos de peticiones en vuelo.
+UPSTREAM_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+UPSTREAM_TIMEOUT = 120
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 256))
+
+http = requests.Session()
+http.headers.update(UPSTREAM_HEADERS)
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE)
+http.mount('http://', _adapter)
+http.mount('https://', _adapter)
+
+
+def upstream_get(url, params=None, timeout=UPSTREAM_TIMEOUT):
+    """GET contra la API externa usando la sesión compartida"""
+    return http.get(url, params=params, timeout=timeout)
+# ===========================================================================
+
+# ==================== PROFILING DE PETICIONES (SOLO ADMIN) ====================
+# Apagado por defecto. Con PROFILE_ADMIN_TOKEN definido, una petición se
+# perfila si trae X-Profile: 1 (o ?_profile=1) junto con X-Admin-Token; con
+# PROFILE_SAMPLE_RATE > 0 además se perfila esa fracción de las peticiones.
+# Cada perfil se guarda en PROFILE_DIR en dos formatos:
+#   <id>.pstats     perfil determinista (cProfile), para pstats/snakeviz
+#   <id>.collapsed  pilas muestreadas cada PROFILE_SAMPLE_INTERVAL s, para flamegraph.pl/speedscope
+# más <id>.json con la ruta, el status y la duración.
+# Con workers gevent todas las peticiones de un worker comparten un hilo del SO:
+#   - el muestreador corre en un hilo real del SO (no un greenlet, que solo
+#     correría cuando la petición cede) y solo cuenta las muestras en que el
+#     greenlet de la petición es el que está ejecutando;
+#   - cProfile, en cambio, registra todo lo que corre en ese hilo mientras está
+#     activo, incluidas otras peticiones que se intercalen: para un .pstats
+#     limpio, perfilar con tráfico bajo o con un worker sync.
+PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+PROFILE_ID_RE = re.compile(r'^[0-9]+_[A-Za-z0-9_]+$')
+PROFILING_ENABLED = bool(PROFILE_ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def is_admin_request():
+    token = request.headers.get('X-Admin-Token') or ''
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+# Primitivas de hilos del SO aunque gevent haya parchado threading/_thread/time
+if GEVENT_PATCHED:
+    _os_start_thread = gevent_monkey.get_original('_thread', 'start_new_thread')
+    _os_get_ident = gevent_monkey.get_original('_thread', 'get_ident')
+    _os_allocate_lock = gevent_monkey.get_original('_thread', 'allocate_lock')
+    _os_sleep = gevent_monkey.get_original('time', 'sleep')
+else:
+    _os_start_thread = _thread.start_new_thread
+    _os_get_ident = _thread.get_ident
+    _os_allocate_lock = _thread.allocate_lock
+    _os_sleep = time.sleep
+
+
+class StackSampler:
+    """
+    Muestrea desde un hilo del SO las pilas de la petición actual y las acumula
+    en formato collapsed. Con gevent solo cuenta cuando el greenlet de la
+    petición está corriendo (gr_frame es None mientras ejecuta).
+    """
+
+    def __init__(self, interval):
+        self.thread_id = _os_get_ident()
+        self.greenlet = greenlet.getcurrent() if GEVENT_PATCHED else None
+        self.interval = interval
+        self.stacks = {}
+        self.running = False
+        self.finished = _os_allocate_lock()
+
+    def start(self):
+        self.running = True
+        self.finished.acquire()
+        _os_start_thread(self.run, ())
+
+    def run(self):
+        try:
+            while self.running:
+                _os_sleep(self.interval)
+                if self.greenlet is not None and (self.greenlet.gr_frame is not None or self.greenlet.dead):
+                    continue  # la petición está en espera y corre otro greenlet
+                frame = sys._current_frames().get(self.thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    key = ';'.join(reversed(stack))
+                    self.stacks[key] = self.stacks.get(key, 0) + 1
+        finally:
+            self.finished.release()
+
+    def stop(self):
+        self.running = False
+        self.finished.acquire()
+        self.finished.release()
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def start_request_profile():
+    requested = request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1'
+    if requested and not is_admin_request():
+        requested = False
+    if not requested and not (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Ya hay otro perfilador activo en este hilo
+        return
+    sampler = StackSampler(PROFILE_SAMPLE_INTERVAL)
+    sampler.start()
+    g.request_profile = (profiler, sampler, time.perf_counter())
+
+
+def stop_request_profile(response):
+    state = g.pop('request_profile', None)
+    if state is None:
+        return None
+    profiler, sampler, started = state
+    profiler.disable()
+    sampler.stop()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    created = int(time.time() * 1000)
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+    profile_id = f"{created}_{slug}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(PROFILE_DIR, profile_id + '.pstats'))
+    with open(os.path.join(PROFILE_DIR, profile_id + '.collapsed'), 'w') as f:
+        f.write(sampler.collapsed())
+    with open(os.path.join(PROFILE_DIR, profile_id + '.json'), 'w') as f:
+        json.dump({
+            'id': profile_id,
+            'created': created,
+            'method': request.method,
+            'path': request.path,
+            'query': request.query_string.decode('utf-8', 'replace'),
+            'status': response.status_code,
+            'duration_ms': round(elapsed_ms, 1),
+            'samples': sum(sampler.stacks.values()),
+            # Con gevent el .pstats puede incluir otras peticiones del mismo worker
+            'gevent': GEVENT_PATCHED
+        }, f)
+    prune_profiles()
+    print(f"🔬 Profile saved: {profile_id} ({elapsed_ms:.0f} ms)")
+    return profile_id
+
+
+def finish_request_profile(response):
+    if 'request_profile' in g:
+        try:
+            profile_id = stop_request_profile(response)
+            if profile_id:
+                response.headers['X-Profile-Id'] = profile_id
+        except Exception as e:
+            print(f"⚠️ Could not save request profile: {e}")
+    return response
+
+
+def discard_request_profile(exc):
+    # Si la vista lanzó una excepción after_request no corre: apagar el perfilador igual
+    state = g.pop('request_profile', None)
+    if state is not None:
+        state[0].disable()
+        state[1].stop()
+
+
+# Los hooks solo se registran si el profiling está configurado: apagado no agrega costo
+if PROFILING_ENABLED:
+    if GEVENT_PATCHED:
+        print("⚠️ Profiling under gevent: .pstats files include every greenlet of the worker "
+              "that runs during the request; .collapsed samples only the profiled request")
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(discard_request_profile)
+
+
+PROFILE_FORMATS = ('pstats', 'collapsed', 'json')
+
+
+def list_profiles():
+    """Perfiles guardados, del más nuevo al más antiguo"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    # Archivos ajenos al formato <ms>_<ruta> se ignoran (no se listan ni se podan)
+    ids = {name.rsplit('.', 1)[0] for name in os.listdir(PROFILE_DIR)
+           if name.rsplit('.', 1)[-1] in PROFILE_FORMATS}
+    ids = {i for i in ids if PROFILE_ID_RE.match(i)}
+    return sorted(ids, key=lambda i: int(i.split('_', 1)[0]), reverse=True)
+
+
+def prune_profiles():
+    """Conserva solo los PROFILE_KEEP perfiles más recientes"""
+    for profile_id in list_profiles()[PROFILE_KEEP:]:
+        for fmt in PROFILE_FORMATS:
+            try:
+                os.remove(os.path.join(PROFILE_DIR, f'{profile_id}.{fmt}'))
+            except OSError:
+                pass
+
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def admin_profiles():
+    """Lista los perfiles recientes (requiere X-Admin-Token)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    profiles = []
+    for profile_id in list_profiles():
+        try:
+            with open(os.path.join(PROFILE_DIR, profile_id + '.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {'id': profile_id}
+        meta['files'] = {
+            fmt: f'/api/admin/profiles/{profile_id}.{fmt}'
+            for fmt in ('pstats', 'collapsed')
+            if os.path.exists(os.path.join(PROFILE_DIR, f'{profile_id}.{fmt}'))
+        }
+        profiles.append(meta)
+    return jsonify({'profile_dir': PROFILE_DIR, 'sample_rate': PROFILE_SAMPLE_RATE, 'profiles': profiles})
+
+
+@app.route('/api/admin/profiles/<profile_id>.<fmt>', methods=['GET'])
+def admin_profile_download(profile_id, fmt):
+    """Descarga un perfil en formato pstats o collapsed (requiere X-Admin-Token)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    path = os.path.join(PROFILE_DIR, f'{profile_id}.{fmt}')
+    if fmt not in PROFILE_FORMATS or not PROFILE_ID_RE.match(profile_id) or not os.path.exists(path):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(os.path.abspath(path), as_attachment=True,
+                     mimetype='application/octet-stream' if fmt == 'pstats' else 'text/plain')
+# ===========================================================================
 
 @app.route('/')
 def index():
@@ -36,110 +327,1148 @@ def test_db():
     """Página de prueba para verificar IndexedDB"""
     return render_template('test-db.html')
 
+# ==================== INGESTA COMPARTIDA ====================
+MONTHLY_CACHE_KEY = 'monthly_ingestion_data'
+MONTHLY_CACHE_TIMEOUT = 31536000  # 1 año
+
+
+def fetch_all_events(per_page=100):
+    """Recorre todas las páginas de /events de la API externa"""
+    all_events = []
+    page = 1
+
+    while True:
+        try:
+            params = {'page': page, 'per_page': per_page}
+            response = upstream_get(f"{API_BASE_URL}/events", params=params)
+            response.raise_for_status()
+            data = response.json()
+            events = data.get('events') or []
+            
+            if not events:
+                break
+            
+            all_events.extend(events)
+            page += 1
+            print(f"Fetched page {page-1}, total events: {len(all_events)}")
+            
+        except requests.RequestException as e:
+            print(f"Error fetching page {page}: {e}")
+            break
+
+    print(f"✅ Total events fetched: {len(all_events)}")
+    return all_events
+
+
+def build_dataset(all_events, api_params):
+    """Construye el dataset completo (params + grafo) a partir de los eventos crudos"""
+    # Extract params from events as fallback/supplement
+    print("Extracting params from events...")
+    try:
+        extracted_params = extract_params_from_events(all_events)
+        
+        # Merge API params with extracted params
+        if api_params:
+            merged_params = merge_params(api_params, extracted_params)
+        else:
+            merged_params = extracted_params
+        
+        print(f"Params ready: {len(merged_params.get('composers', []))} composers, {len(merged_params.get('cities', []))} cities")
+    
+    except Exception as e:
+        print(f"Error extracting params: {e}")
+        import traceback
+        traceback.print_exc()
+        merged_params = api_params or {'composers': [], 'cities': [], 'instruments': [], 'event_types': [], 'cycles': [], 'premiere_types': []}
+
+    # Derived fields and aggregate tables for the table view
+    try:
+        tables = derive_dataset_fields(all_events)
+    except Exception as e:
+        print(f"Error deriving event fields: {e}")
+        import traceback
+        traceback.print_exc()
+        tables = None
+
+    # Process events to graph
+    print("Processing events into graph format...")
+    try:
+        # Secuencial: build_dataset corre dentro de los workers web (ver build_graph)
+        nodes, links = build_graph(all_events)
+        print(f"✅ Graph complete: {len(nodes)} nodes, {len(links)} links")
+    except Exception as e:
+        print(f"Error processing graph: {e}")
+        import traceback
+        traceback.print_exc()
+        nodes, links = [], []
+
+    timestamp = int(time.time() * 1000)
+    return {
+        'params': merged_params,
+        'events': all_events,
+        'nodes': nodes,
+        'links': links,
+        'tables': tables,
+        'derived_version': DERIVED_FIELDS_VERSION if tables is not None else None,
+        'total_events': len(all_events),
+        'timestamp': timestamp,
+        'version': timestamp,
+        'cached': False
+    }
+
+
+def publish_dataset(result):
+    """Guarda un dataset válido en Redis y deja un snapshot en disco"""
+    cache.set(MONTHLY_CACHE_KEY, result, timeout=MONTHLY_CACHE_TIMEOUT)
+    print(f"✅ Data cached successfully: {len(result['events'])} events")
+    try:
+        prebuild_fragments(result)
+    except Exception as e:
+        print(f"⚠️ Could not build response fragments: {e}")
+    try:
+        record_dataset_version(result)
+    except Exception as e:
+        print(f"⚠️ Could not record dataset version: {e}")
+    try:
+        save_snapshot(result)
+    except Exception as e:
+        # El snapshot es un respaldo: si falla, el caché ya quedó actualizado
+        print(f"⚠️ Could not write dataset snapshot: {e}")
+
+
+def ingest_dataset():
+    """Ingesta completa: parámetros + eventos + grafo. Publica solo si hay eventos."""
+    print("Fetching API parameters...")
+    api_params = fetch_api_params()
+    print(f"API params fetched: {list(api_params.keys()) if api_params else 'None'}")
+
+    all_events = fetch_all_events()
+    result = build_dataset(all_events, api_params)
+
+    # Solo cachear si hay eventos válidos
+    if len(all_events) > 0:
+        publish_dataset(result)
+    else:
+        print("⚠️ No events fetched, NOT caching empty response")
+    return result
+
+# ==================== SNAPSHOTS EN DISCO (WARM START) ====================
+# Cada ingesta exitosa deja un snapshot comprimido y versionado en disco:
+#   dataset_v<formato>_<timestamp>.json.gz  +  dataset_v<formato>_<timestamp>.json.gz.sha256
+# El .sha256 se escribe al final, así que un snapshot a medio escribir nunca es válido.
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots'))
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', 3))
+SNAPSHOT_PATTERN = re.compile(r'^dataset_v(\d+)_(\d+)\.json\.gz$')
+REFRESH_LOCK_KEY = 'background_refresh_lock'
+RESTORE_LOCK_KEY = 'snapshot_restore_lock'
+RESTORE_WAIT_SECONDS = float(os.environ.get('RESTORE_WAIT_SECONDS', 15))
+PROCESS_START = time.time()
+
+
+def save_snapshot(result):
+    """Escribe el dataset comprimido en disco de forma atómica"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    payload = json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    checksum = hashlib.sha256(payload).hexdigest()
+
+    name = f"dataset_v{SNAPSHOT_FORMAT_VERSION}_{result['timestamp']}.json.gz"
+    path = os.path.join(SNAPSHOT_DIR, name)
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+    with open(path + '.sha256.tmp', 'w') as f:
+        f.write(checksum)
+    os.replace(path + '.sha256.tmp', path + '.sha256')
+    print(f"💾 Snapshot saved: {name} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+    prune_snapshots()
+    return path
+
+
+def list_snapshots():
+    """Snapshots del formato actual, del más nuevo al más antiguo"""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    found = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        match = SNAPSHOT_PATTERN.match(name)
+        if match and int(match.group(1)) == SNAPSHOT_FORMAT_VERSION:
+            found.append((int(match.group(2)), os.path.join(SNAPSHOT_DIR, name)))
+    return [path for _, path in sorted(found, reverse=True)]
+
+
+def prune_snapshots():
+    """Conserva solo los SNAPSHOT_KEEP snapshots más recientes"""
+    for path in list_snapshots()[SNAPSHOT_KEEP:]:
+        for stale in (path, path + '.sha256'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def read_snapshot(path):
+    """Lee un snapshot y verifica su checksum. Devuelve None si no es válido."""
+    try:
+        with open(path + '.sha256') as f:
+            expected = f.read().strip()
+        with gzip.open(path, 'rb') as f:
+            payload = f.read()
+    except (OSError, EOFError) as e:
+        print(f"⚠️ Unreadable snapshot {os.path.basename(path)}: {e}")
+        return None
+
+    if hashlib.sha256(payload).hexdigest() != expected:
+        print(f"⚠️ Checksum mismatch in snapshot {os.path.basename(path)}, skipping")
+        return None
+
+    try:
+        data = json.loads(payload)
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Invalid JSON in snapshot {os.path.basename(path)}: {e}")
+        return None
+    return data if data.get('events') else None
+
+
+def load_latest_snapshot():
+    """Devuelve el snapshot válido más reciente, o None"""
+    for path in list_snapshots():
+        data = read_snapshot(path)
+        if data:
+            return data
+    return None
+
+
+def start_background_refresh():
+    """
+    Lanza una ingesta en segundo plano, como máximo una a la vez entre todos los workers.
+    Con workers gevent el "hilo" es un greenlet: la descarga coopera, pero
+    build_dataset y los manifiestos son CPU puro y bloquean todo el worker mientras
+    corren. En ese modo conviene refrescar con ingest.py (cron) en vez de aquí.
+    """
+    # cache.add solo escribe si la llave no existe: sirve de lock compartido vía Redis
+    if not cache.add(REFRESH_LOCK_KEY, int(time.time()), timeout=3600):
+        print("🔄 Background refresh already running, skipping")
+        return False
+
+    def run():
+        try:
+            print("🔄 Background refresh started")
+            ingest_dataset()
+        except Exception as e:
+            print(f"Error in background refresh: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+
+    threading.Thread(target=run, name='background-refresh', daemon=True).start()
+    return True
+
+
+def upgrade_derived_fields(data):
+    """
+    Recalcula event['derived'] y las tablas si el dataset se armó con otras reglas
+    (derived_version != DERIVED_FIELDS_VERSION, p. ej. un snapshot de antes de un
+    deploy). Le asigna una versión nueva para que los clientes reciban el cambio
+    por delta. Devuelve True si modificó el dataset.
+    """
+    if data.get('derived_version') == DERIVED_FIELDS_VERSION:
+        return False
+    started = time.time()
+    previous = data.get('derived_version')
+    data['tables'] = derive_dataset_fields(data.get('events') or [])
+    data['derived_version'] = DERIVED_FIELDS_VERSION
+    data['version'] = int(time.time() * 1000)
+    print(f"🧮 Derived fields upgraded {previous} -> {DERIVED_FIELDS_VERSION} "
+          f"in {(time.time() - started) * 1000:.0f} ms (new version {data['version']})")
+    return True
+
+
+def wait_for_restore():
+    """Espera a que otro proceso termine de restaurar; si tarda demasiado, lee el snapshot sin publicarlo"""
+    deadline = time.time() + RESTORE_WAIT_SECONDS
+    while time.time() < deadline:
+        data = cache.get(MONTHLY_CACHE_KEY)
+        if data and data.get('events'):
+            return data
+        if not cache.get(RESTORE_LOCK_KEY):
+            break
+        time.sleep(0.2)
+    data = cache.get(MONTHLY_CACHE_KEY)
+    if data and data.get('events'):
+        return data
+    print("⚠️ Snapshot restore still running elsewhere, serving snapshot from disk")
+    snapshot = load_latest_snapshot()
+    if snapshot:
+        upgrade_derived_fields(snapshot)
+    return snapshot
+
+
+def restore_from_snapshot():
+    """
+    Carga el snapshot más reciente en Redis. Devuelve el dataset o None.
+    Solo un proceso restaura a la vez (lock con cache.add, igual que el refresco);
+    los demás esperan a que aparezca en Redis.
+    """
+    if not cache.add(RESTORE_LOCK_KEY, int(time.time()), timeout=300):
+        return wait_for_restore()
+    try:
+        # Otro proceso pudo terminar justo antes de tomar el lock
+        data = cache.get(MONTHLY_CACHE_KEY)
+        if data and data.get('events'):
+            return data
+        started = time.time()
+        snapshot = load_latest_snapshot()
+        if not snapshot:
+            return None
+        if upgrade_derived_fields(snapshot):
+            # Versión nueva: fragmentos, manifiesto y snapshot también se rehacen
+            publish_dataset(snapshot)
+        else:
+            cache.set(MONTHLY_CACHE_KEY, snapshot, timeout=MONTHLY_CACHE_TIMEOUT)
+            record_dataset_version(snapshot)
+        print(f"♻️ Snapshot restored into cache: {len(snapshot['events'])} events "
+              f"in {(time.time() - started) * 1000:.0f} ms "
+              f"({(time.time() - PROCESS_START) * 1000:.0f} ms since process start)")
+        return snapshot
+    finally:
+        cache.delete(RESTORE_LOCK_KEY)
+
+
+def upgrade_cached_dataset():
+    """Si el dataset en Redis tiene campos derivados de otra versión, lo recalcula y publica (un proceso)"""
+    if not cache.add(RESTORE_LOCK_KEY, int(time.time()), timeout=300):
+        return False
+    try:
+        data = cache.get(MONTHLY_CACHE_KEY)
+        if not data or not data.get('events') or not upgrade_derived_fields(data):
+            return False
+        publish_dataset(data)
+        return True
+    finally:
+        cache.delete(RESTORE_LOCK_KEY)
+
+
+def warm_start():
+    """
+    Al iniciar: si Redis está vacío, cargar el último snapshot y refrescar en segundo
+    plano; si tiene un dataset con campos derivados de otra versión, recalcularlos.
+    """
+    try:
+        cached_data = cache.get(MONTHLY_CACHE_KEY)
+        if cached_data and cached_data.get('events'):
+            if cached_data.get('derived_version') != DERIVED_FIELDS_VERSION:
+                upgrade_cached_dataset()
+            return
+        if restore_from_snapshot():
+            start_background_refresh()
+    except Exception as e:
+        print(f"⚠️ Warm start skipped: {e}")
+
+# ==================== VERSIONES DEL DATASET Y DELTA SYNC ====================
+# Por cada versión publicada se guarda un manifiesto {id: digest} de eventos y
+# nodos, y {clave: cantidad} de enlaces (los enlaces no tienen id y pueden
+# repetirse). Con el manifiesto de la versión del cliente y el dataset actual
+# se calcula qué agregar, cambiar o borrar, sin guardar los datasets anteriores.
+DATASET_VERSION_KEY = 'dataset_version'
+DATASET_HISTORY_KEY = 'dataset_versions'
+DATASET_HISTORY_SIZE = int(os.environ.get('DATASET_HISTORY_SIZE', 5))
+
+
+def dataset_version(data):
+    """Versión de un dataset (los snapshots antiguos solo tienen timestamp)"""
+    return data.get('version') or data.get('timestamp')
+
+
+def manifest_key(version):
+    return f'dataset_manifest_{version}'
+
+
+def item_digest(item):
+    return hashlib.blake2b(
+        json.dumps(item, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        digest_size=8
+    ).hexdigest()
+
+
+def event_key(event):
+    return str(event.get('id') or hash_string(event.get('name') or 'unknown'))
+
+
+def link_key(link):
+    return f"{link.get('source')}|{link.get('target')}|{link.get('label')}"
+
+
+def build_manifest(data):
+    """Digests por elemento de un dataset"""
+    link_counts = {}
+    for link in data.get('links') or []:
+        key = link_key(link)
+        link_counts[key] = link_counts.get(key, 0) + 1
+    return {
+        'version': dataset_version(data),
+        'events': {event_key(e): item_digest(e) for e in data.get('events') or [] if isinstance(e, dict)},
+        'nodes': {str(n['id']): item_digest(n) for n in data.get('nodes') or []},
+        'links': link_counts,
+        'params': item_digest(data.get('params')),
+        'tables': item_digest(data.get('tables'))
+    }
+
+
+def record_dataset_version(data):
+    """Registra la versión publicada y su manifiesto; recorta el historial"""
+    version = dataset_version(data)
+    manifest = build_manifest(data)
+    cache.set(manifest_key(version), manifest, timeout=MONTHLY_CACHE_TIMEOUT)
+
+    history = [v for v in (cache.get(DATASET_HISTORY_KEY) or []) if v != version]
+    history.append(version)
+    for expired in history[:-DATASET_HISTORY_SIZE]:
+        cache.delete(manifest_key(expired))
+    cache.set(DATASET_HISTORY_KEY, history[-DATASET_HISTORY_SIZE:], timeout=MONTHLY_CACHE_TIMEOUT)
+
+    drop_stale_fragments(version)
+
+    # La llave de versión se escribe al final: quien la lea ya encuentra el manifiesto
+    cache.set(DATASET_VERSION_KEY, version, timeout=MONTHLY_CACHE_TIMEOUT)
+    publish_dataset_version(version)
+    return manifest
+
+
+def diff_by_id(items, key_fn, old_digests, new_digests):
+    """Elementos agregados o cambiados, e ids eliminados"""
+    upserted = [item for item in items
+                if old_digests.get(key_fn(item)) != new_digests.get(key_fn(item))]
+    removed = [item_id for item_id in old_digests if item_id not in new_digests]
+    return {'upserted': upserted, 'removed': removed}
+
+
+def diff_links(links, old_counts, new_counts):
+    """Diferencia de multiconjuntos: enlaces a agregar y claves a quitar (con repetición)"""
+    added = []
+    pending = {}
+    for key, count in new_counts.items():
+        extra = count - old_counts.get(key, 0)
+        if extra > 0:
+            pending[key] = extra
+    for link in links:
+        key = link_key(link)
+        if pending.get(key):
+            added.append(link)
+            pending[key] -= 1
+
+    removed = []
+    for key, count in old_counts.items():
+        missing = count - new_counts.get(key, 0)
+        if missing > 0:
+            removed.extend([key] * missing)
+    return {'added': added, 'removed': removed}
+
+
+def compute_dataset_delta(current, old_manifest, new_manifest):
+    delta = {
+        'events': diff_by_id(current.get('events') or [], event_key,
+                             old_manifest['events'], new_manifest['events']),
+        'nodes': diff_by_id(current.get('nodes') or [], lambda n: str(n['id']),
+                            old_manifest['nodes'], new_manifest['nodes']),
+        'links': diff_links(current.get('links') or [], old_manifest['links'], new_manifest['links'])
+    }
+    # params y tables son pequeños: se reenvían completos solo si cambiaron
+    if old_manifest['params'] != new_manifest['params']:
+        delta['params'] = current.get('params')
+    if old_manifest['tables'] != new_manifest['tables']:
+        delta['tables'] = current.get('tables')
+    return delta
+
+
+@app.route('/api/dataset_delta', methods=['GET'])
+def dataset_delta():
+    """
+    Cambios del dataset desde la versión `since` que tiene el cliente.
+    Si esa versión ya salió del historial, responde full_resync=true.
+    """
+    since = request.args.get('since', type=int)
+    try:
+        current = cache.get(MONTHLY_CACHE_KEY)
+        if not current or not current.get('events'):
+            return jsonify({'full_resync': True, 'reason': 'no cached dataset'})
+
+        version = dataset_version(current)
+        if since == version:
+            return jsonify({'version': version, 'up_to_date': True, 'full_resync': False})
+
+        old_manifest = cache.get(manifest_key(since)) if since else None
+        if not old_manifest:
+            return jsonify({'version': version, 'full_resync': True, 'reason': 'version too old'})
+
+        new_manifest = cache.get(manifest_key(version)) or record_dataset_version(current)
+        delta = compute_dataset_delta(current, old_manifest, new_manifest)
+        print(f"🔀 Delta {since} -> {version}: "
+              f"{len(delta['events']['upserted'])}+/{len(delta['events']['removed'])}- events, "
+              f"{len(delta['nodes']['upserted'])}+/{len(delta['nodes']['removed'])}- nodes, "
+              f"{len(delta['links']['added'])}+/{len(delta['links']['removed'])}- links")
+
+        return jsonify({
+            'since': since,
+            'version': version,
+            'timestamp': current.get('timestamp'),
+            'derived_version': current.get('derived_version'),
+            'full_resync': False,
+            'up_to_date': False,
+            **delta
+        })
+    except Exception as e:
+        print(f"Error computing dataset delta: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'full_resync': True, 'reason': str(e)}), 500
+
+# ==================== EXPORTACIONES EN STREAMING ====================
+# Las exportaciones se generan por partes desde el dataset publicado: cada
+# generador arma EXPORT_CHUNK_ROWS filas, las entrega y libera el buffer, así
+# que la respuesta nunca se construye completa en memoria.
+# El dataset mismo se carga una vez por proceso y versión (published_dataset),
+# compartido por todas las descargas en curso del worker.
+# Excepción: Parquet escribe primero el archivo completo en un temporal (ver
+# stream_parquet), así que cada descarga Parquet ocupa en disco el tamaño del
+# archivo y el primer byte llega recién cuando terminó de escribirse.
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 2000))
+
+EVENT_EXPORT_COLUMNS = [
+    'id', 'name', 'date', 'year', 'event_type', 'cycle', 'location', 'venue', 'city',
+    'participants_count', 'participants', 'composers', 'program_summary'
+]
+TABLE_EXPORT_COLUMNS = {
+    'participants': ['name', 'activity', 'gender', 'events_count'],
+    'composers': ['name', 'pieces_count', 'events_count'],
+    'cities': ['name', 'events_count'],
+    'locations': ['name', 'city', 'events_count']
+}
+NODE_EXPORT_COLUMNS = ['id', 'label', 'type', 'year']
+LINK_EXPORT_COLUMNS = ['source', 'target', 'label']
+
+
+def current_dataset():
+    """Dataset publicado: Redis y, si está vacío, el último snapshot"""
+    data = cache.get(MONTHLY_CACHE_KEY)
+    if data and data.get('events'):
+        return data
+    return restore_from_snapshot()
+
+
+def event_export_rows(events):
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        derived = event.get('derived') or derive_event_fields(event)
+        composers = []
+        for piece in event.get('program') or []:
+            if isinstance(piece, dict):
+                for composer in piece.get('composers') or []:
+                    if composer and composer != 'Desconocido' and composer not in composers:
+                        composers.append(composer)
+        yield {
+            'id': event.get('id'),
+            'name': event.get('name'),
+            'date': event.get('date'),
+            'year': derived['year'],
+            'event_type': event.get('event_type'),
+            'cycle': event.get('cycle'),
+            'location': event.get('location'),
+            'venue': derived['venue'],
+            'city': derived['city'],
+            'participants_count': derived['participants_count'],
+            'participants': '; '.join(p.get('name') or '' for p in event.get('participants') or []
+                                      if isinstance(p, dict)),
+            'composers': '; '.join(composers),
+            'program_summary': derived['program_summary']
+        }
+
+
+def export_rows(data, name):
+    """Columnas y generador de filas (dicts) de una exportación tabular"""
+    if name == 'events':
+        return EVENT_EXPORT_COLUMNS, event_export_rows(data.get('events') or [])
+    if name == 'nodes':
+        return NODE_EXPORT_COLUMNS, iter(data.get('nodes') or [])
+    if name == 'links':
+        return LINK_EXPORT_COLUMNS, iter(data.get('links') or [])
+    tables = data.get('tables')
+    if tables is None:
+        # Snapshots anteriores a los campos derivados
+        tables = derive_dataset_fields(data.get('events') or [])
+    return TABLE_EXPORT_COLUMNS[name], iter(tables.get(name) or [])
+
+
+def chunk_rows(rows, size=EXPORT_CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(columns, rows):
+    """CSV por bloques de EXPORT_CHUNK_ROWS filas (con BOM para Excel)"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    buffer.write('\ufeff')
+    writer.writeheader()
+    for chunk in chunk_rows(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_graphml(nodes, links):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+           '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+           '  <key id="type" for="node" attr.name="type" attr.type="string"/>\n'
+           '  <key id="year" for="node" attr.name="year" attr.type="string"/>\n'
+           '  <key id="relation" for="edge" attr.name="label" attr.type="string"/>\n'
+           '  <graph id="G" edgedefault="directed">\n')
+    for chunk in chunk_rows(nodes):
+        parts = []
+        for node in chunk:
+            parts.append(f'    <node id={quoteattr(str(node["id"]))}>'
+                         f'<data key="label">{xml_escape(str(node.get("label") or ""))}</data>'
+                         f'<data key="type">{xml_escape(str(node.get("type") or ""))}</data>')
+            if node.get('year') is not None:
+                parts.append(f'<data key="year">{xml_escape(str(node["year"]))}</data>')
+            parts.append('</node>\n')
+        yield ''.join(parts)
+    for chunk in chunk_rows(enumerate(links)):
+        yield ''.join(
+            f'    <edge id="e{i}" source={quoteattr(str(link["source"]))} target={quoteattr(str(link["target"]))}>'
+            f'<data key="relation">{xml_escape(str(link.get("label") or ""))}</data></edge>\n'
+            for i, link in chunk
+        )
+    yield '  </graph>\n</graphml>\n'
+
+
+def stream_gexf(nodes, links):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gexf xmlns="http://gexf.net/1.3" version="1.3">\n'
+           '  <graph defaultedgetype="directed">\n'
+           '    <attributes class="node">\n'
+           '      <attribute id="type" title="type" type="string"/>\n'
+           '      <attribute id="year" title="year" type="string"/>\n'
+           '    </attributes>\n'
+           '    <nodes>\n')
+    for chunk in chunk_rows(nodes):
+        parts = []
+        for node in chunk:
+            parts.append(f'      <node id={quoteattr(str(node["id"]))} label={quoteattr(str(node.get("label") or ""))}>'
+                         f'<attvalues><attvalue for="type" value={quoteattr(str(node.get("type") or ""))}/>')
+            if node.get('year') is not None:
+                parts.append(f'<attvalue for="year" value={quoteattr(str(node["year"]))}/>')
+            parts.append('</attvalues></node>\n')
+        yield ''.join(parts)
+    yield '    </nodes>\n    <edges>\n'
+    for chunk in chunk_rows(enumerate(links)):
+        yield ''.join(
+            f'      <edge id="{i}" source={quoteattr(str(link["source"]))} target={quoteattr(str(link["target"]))} '
+            f'label={quoteattr(str(link.get("label") or ""))}/>\n'
+            for i, link in chunk
+        )
+    yield '    </edges>\n  </graph>\n</gexf>\n'
+
+
+def stream_parquet(columns, rows):
+    """
+    Escribe un row group por bloque en un archivo temporal y lo envía por partes.
+    Parquet necesita el footer al final, así que no se puede emitir mientras se escribe:
+    la memoria queda acotada a un bloque, pero cada descarga en curso ocupa en
+    tempfile.gettempdir() un archivo del tamaño completo de la exportación.
+    """
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    fd, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+            for chunk in chunk_rows(rows):
+                arrays = [pa.array([None if row.get(c) is None else str(row.get(c)) for row in chunk],
+                                   type=pa.string()) for c in columns]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(1024 * 1024)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
+
+
+def export_response(generator, mimetype, filename):
+    response = Response(stream_with_context(generator), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@app.route('/api/export/<name>.<fmt>', methods=['GET'])
+def export_dataset(name, fmt):
+    """
+    Exporta el dataset publicado sin armarlo en memoria:
+      /api/export/<events|participants|composers|cities|locations|nodes|links>.<csv|parquet>
+      /api/export/graph.<graphml|gexf>
+    Con ?version=<v> (la versión que tiene el cliente) responde 409 si el dataset
+    publicado es otro, para que la descarga coincida con lo que se ve en pantalla.
+    HEAD solo hace esa verificación.
+    """
+    tabular = ['events', 'nodes', 'links'] + list(TABLE_EXPORT_COLUMNS)
+    if not ((name in tabular and fmt in ('csv', 'parquet')) or
+            (name == 'graph' and fmt in ('graphml', 'gexf'))):
+        return jsonify({'error': f'Unsupported export: {name}.{fmt}'}), 404
+    if fmt == 'parquet' and pa is None:
+        return jsonify({'error': 'Parquet export requires pyarrow'}), 501
+
+    expected = request.args.get('version', type=int)
+    published = current_dataset_version()
+    if expected and published and published != expected:
+        return jsonify({'error': 'Dataset version changed', 'version': published, 'expected': expected}), 409
+    if request.method == 'HEAD':
+        return Response(status=200)
+
+    version, data = published_dataset.get()
+    if not data:
+        return jsonify({'error': 'No dataset available yet'}), 503
+
+    if expected and version != expected:
+        return jsonify({'error': 'Dataset version changed', 'version': version, 'expected': expected}), 409
+    filename = f'{name}_{version}.{fmt}'
+    print(f"📤 Export {filename} requested")
+
+    if fmt == 'graphml':
+        return export_response(stream_graphml(data.get('nodes') or [], data.get('links') or []),
+                               'application/graphml+xml', filename)
+    if fmt == 'gexf':
+        return export_response(stream_gexf(data.get('nodes') or [], data.get('links') or []),
+                               'application/gexf+xml', filename)
+
+    columns, rows = export_rows(data, name)
+    if fmt == 'parquet':
+        return export_response(stream_parquet(columns, rows), 'application/vnd.apache.parquet', filename)
+    return export_response(stream_csv(columns, rows), 'text/csv; charset=utf-8', filename)
+
+# ==================== FRAGMENTOS JSON PRE-SERIALIZADOS ====================
+# Cada sección del dataset (params, events, nodes, links, tables) se guarda ya
+# serializada en Redis, una vez por versión. /api/monthly_ingestion arma la
+# respuesta concatenando los fragmentos pedidos con include= y, para fields=,
+# un fragmento de eventos proyectado que también se guarda por versión.
+# Así una respuesta no deserializa ni vuelve a serializar el dataset.
+# Las llaves de fragmentos se registran en un set de Redis (SADD es atómico entre
+# workers) para que drop_stale_fragments las encuentre todas. Además expiran antes
+# que el dataset: si un fragmento vigente expira, se vuelve a armar en la próxima
+# petición, y uno que se escape de la limpieza no queda ocupando memoria un año.
+DATASET_SECTIONS = ('params', 'events', 'nodes', 'links', 'tables')
+DATASET_META_FIELDS = ('total_events', 'timestamp', 'version', 'derived_version')
+FRAGMENT_KEYS_KEY = 'dataset_fragment_key_set'
+FRAGMENT_KEYS_LEGACY_KEY = 'dataset_fragment_keys'  # lista de versiones anteriores
+FRAGMENT_MAX_PROJECTIONS = 16  # combinaciones de fields= guardadas por versión
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 7 * 24 * 3600))
+_fragment_keys_lock = threading.Lock()  # solo para backends sin Redis (un proceso)
+
+
+def parse_list_arg(name):
+    """'a,b , c' -> ['a', 'b', 'c'] (None si el parámetro no viene)"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def fragment_key(version, section, fields=None):
+    key = f'dataset_fragment_{version}_{section}'
+    return key + '__' + ','.join(fields) if fields else key
+
+
+def serialize_section(data, section, fields=None):
+    if section == 'meta':
+        value = {field: data.get(field) for field in DATASET_META_FIELDS}
+        value['version'] = dataset_version(data)
+    elif section == 'events' and fields:
+        value = [{field: event[field] for field in fields if field in event}
+                 for event in data.get('events') or [] if isinstance(event, dict)]
+    else:
+        value = data.get(section)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def fragment_key_set():
+    """(cliente redis-py, nombre real del set) o (None, None) con otros backends"""
+    client = redis_client()
+    if client is None or not hasattr(client, 'sadd'):
+        return None, None
+    return client, app.config['CACHE_KEY_PREFIX'] + FRAGMENT_KEYS_KEY
+
+
+def fragment_keys():
+    client, set_name = fragment_key_set()
+    if client is None:
+        return set(cache.get(FRAGMENT_KEYS_KEY) or ())
+    return {key.decode('utf-8') if isinstance(key, bytes) else key for key in client.smembers(set_name)}
+
+
+def add_fragment_key(key):
+    client, set_name = fragment_key_set()
+    if client is None:
+        with _fragment_keys_lock:
+            cache.set(FRAGMENT_KEYS_KEY, fragment_keys() | {key}, timeout=FRAGMENT_CACHE_TIMEOUT)
+        return
+    client.sadd(set_name, key)
+    client.expire(set_name, FRAGMENT_CACHE_TIMEOUT)
+
+
+def remove_fragment_keys(keys):
+    client, set_name = fragment_key_set()
+    if client is None:
+        with _fragment_keys_lock:
+            cache.set(FRAGMENT_KEYS_KEY, fragment_keys() - set(keys), timeout=FRAGMENT_CACHE_TIMEOUT)
+        return
+    client.srem(set_name, *keys)
+
+
+def store_fragment(key, fragment, projected=False):
+    if projected and sum(1 for k in fragment_keys() if '__' in k) >= FRAGMENT_MAX_PROJECTIONS:
+        # Demasiadas combinaciones de fields=: servir sin guardar
+        return
+    # Registrar antes de escribir: una llave nunca existe sin estar en el set
+    add_fragment_key(key)
+    cache.set(key, fragment, timeout=FRAGMENT_CACHE_TIMEOUT)
+
+
+def prebuild_fragments(data):
+    """Serializa las secciones completas de una versión recién publicada"""
+    started = time.time()
+    version = dataset_version(data)
+    for section in ('meta',) + DATASET_SECTIONS:
+        store_fragment(fragment_key(version, section), serialize_section(data, section))
+    print(f"📦 Fragments built for version {version} in {(time.time() - started) * 1000:.0f} ms")
+
+
+def drop_stale_fragments(version):
+    """Borra los fragmentos de versiones anteriores"""
+    prefix = f'dataset_fragment_{version}_'
+    stale = [key for key in fragment_keys() if not key.startswith(prefix)]
+    for key in stale:
+        cache.delete(key)
+    if stale:
+        remove_fragment_keys(stale)
+    # Llaves registradas en la lista que se usaba antes del set
+    legacy = cache.get(FRAGMENT_KEYS_LEGACY_KEY)
+    if legacy:
+        for key in legacy:
+            if not key.startswith(prefix):
+                cache.delete(key)
+        cache.delete(FRAGMENT_KEYS_LEGACY_KEY)
+
+
+def cached_fragment_getter(version, load_dataset):
+    """
+    Lee fragmentos del L1 o de Redis; si falta alguno, carga el dataset una sola vez
+    (load_dataset), lo serializa y lo guarda. Devuelve None si la versión ya no es la actual.
+    """
+    loaded = []
+
+    def get(section, fields=None):
+        key = fragment_key(version, section, fields)
+        fragment = l1_get(key, version)
+        if fragment is None:
+            if not loaded:
+                loaded.append(load_dataset())
+            data = loaded[0]
+            if not data or dataset_version(data) != version:
+                return None
+            fragment = serialize_section(data, section, fields)
+            store_fragment(key, fragment, projected=bool(fields))
+            l1_cache.put(key, fragment, version)
+        return fragment
+    return get
+
+
+def dataset_body(get_fragment, include, fields, cached):
+    """Concatena los fragmentos en un objeto JSON (None si falta alguno)"""
+    meta = get_fragment('meta')
+    if meta is None:
+        return None
+    parts = []
+    for section in include:
+        fragment = get_fragment(section, fields if section == 'events' else None)
+        if fragment is None:
+            return None
+        parts.append(f'"{section}":{fragment}')
+    parts.append(meta[1:-1])
+    parts.append(f'"cached":{"true" if cached else "false"}')
+    return '{' + ','.join(parts) + '}'
+
+
+def dataset_response(body, include, fields, started):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    print(f"📦 monthly_ingestion include={','.join(include)} fields={','.join(fields or []) or '*'}: "
+          f"{len(body) / 1024:.0f} KB in {(time.time() - started) * 1000:.0f} ms")
+    return Response(body, mimetype='application/json')
+
+
+# ==================== CACHÉ L1 EN MEMORIA (POR WORKER) ====================
+# Los fragmentos leídos de Redis se guardan también en memoria del worker, en
+# un LRU acotado por bytes. Todo el L1 pertenece a una sola versión del dataset:
+# cada petición lee la llave de versión (un GET pequeño) y si cambió se vacía.
+# Con L1_PUBSUB=1 cada worker escucha las publicaciones de versión por pub/sub
+# y ni siquiera hace ese GET mientras la suscripción esté activa.
+L1_CACHE_MAX_BYTES = int(os.environ.get('L1_CACHE_MAX_MB', 256)) * 1024 * 1024
+L1_PUBSUB = os.environ.get('L1_PUBSUB', '0') == '1'
+DATASET_VERSION_CHANNEL = app.config['CACHE_KEY_PREFIX'] + 'dataset_version_channel'
+
+
+class L1Cache:
+    """LRU en memoria para valores de una única versión del dataset"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def sync(self, version):
+        """Vacía el caché si la versión publicada cambió"""
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.size = 0
+                self.version = version
+
+    def get(self, key, version):
+        with self.lock:
+            if version != self.version or key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+    def put(self, key, value, version):
+        size = len(value)
+        with self.lock:
+            if version != self.version or size > self.max_bytes:
+                return
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        self.sync(None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'version': self.version,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'pubsub': _version_listener['listening']
+            }
+
+
+l1_cache = L1Cache(L1_CACHE_MAX_BYTES)
+_version_listener = {'listening': False, 'version': None}
+
+
+def current_dataset_version():
+    """Versión publicada: la que llegó por pub/sub o un GET a la llave de versión"""
+    if _version_listener['listening']:
+        version = _version_listener['version']
+    else:
+        version = cache.get(DATASET_VERSION_KEY)
+    l1_cache.sync(version)
+    return version
+
+
+def l1_get(key, version):
+    """Valor de Redis pasando por el L1 (solo se guarda si es de la versión vigente)"""
+    value = l1_cache.get(key, version)
+    if value is None:
+        value = cache.get(key)
+        if value is not None:
+            l1_cache.put(key, value, version)
+    return value
+
+
+class VersionedIndex:
+    """
+    Estructuras derivadas del dataset (índices, proyecciones), una copia por
+    proceso y por clave, reconstruidas solo cuando cambia la versión publicada.
+    get() compara contra current_dataset_version(), que es un GET pequeño (o
+    nada con pub/sub); el dataset completo se lee de Redis solo para construir.
+    """
+
+    def __init__(self, name, builder):
+        self.name = name
+        self.builder = builder  # builder(data, key) -> estructura
+        self.version = None
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key=None):
+        """(versión, estructura) de la versión publicada; (None, None) si no hay dataset"""
+        version = current_dataset_version()
+        with self.lock:
+            if version is not None and version == self.version and key in self.entries:
+                return self.version, self.entries[key]
+
+            data = current_dataset()
+            if not data:
+                return None, None
+            loaded_version = dataset_version(data)
+            if loaded_version != self.version:
+                self.entries.clear()
+                self.version = loaded_version
+            if key not in self.entries:
+                started = time.time()
+                self.entries[key] = self.builder(data, key)
+                print(f"🧱 {self.name}{'' if key is None else f' {key}'} built for version "
+                      f"{loaded_version} in {(time.time() - started) * 1000:.0f} ms")
+            return self.version, self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version = None
+
+
+# Dataset completo para las exportaciones: una copia por proceso y versión en vez de
+# una por descarga (N exportaciones simultáneas ya no cargan N copias). A cambio el
+# worker la retiene después de la primera exportación, hasta la próxima versión.
+published_dataset = VersionedIndex('Published dataset', lambda data, key: data)
+
+
+def redis_client(kind='_write_client'):
+    """Cliente redis-py del backend de Flask-Caching (None con otros backends)"""
+    return getattr(cache.cache, kind, None)
+
+
+def publish_dataset_version(version):
+    """Avisa a los demás workers que cambió la versión publicada"""
+    client = redis_client()
+    if client is None or not hasattr(client, 'publish'):
+        return
+    try:
+        client.publish(DATASET_VERSION_CHANNEL, '' if version is None else str(version))
+    except Exception as e:
+        print(f"⚠️ Could not publish dataset version: {e}")
+
+
+def start_version_listener():
+    """Hilo que mantiene la versión publicada al día vía pub/sub"""
+    client = redis_client('_read_client')
+    if client is None or not hasattr(client, 'pubsub'):
+        print("⚠️ L1 pub/sub unavailable with this cache backend, using version GETs")
+        return False
+
+    def run():
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(DATASET_VERSION_CHANNEL)
+                # Leer la versión después de suscribirse, para no perder una publicación
+                _version_listener['version'] = cache.get(DATASET_VERSION_KEY)
+                _version_listener['listening'] = True
+                for message in pubsub.listen():
+                    data = message['data']
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    _version_listener['version'] = int(data) if data else None
+            except Exception as e:
+                print(f"⚠️ Version listener disconnected: {e}")
+            _version_listener['listening'] = False
+            time.sleep(5)
+
+    threading.Thread(target=run, name='dataset-version-listener', daemon=True).start()
+    return True
+
+
 # ==================== ENDPOINT CON REDIS CACHE MANUAL ====================
 @app.route('/api/monthly_ingestion', methods=['GET'])
 def monthly_ingestion():
     """
     Endpoint principal para obtener todos los eventos.
     Usa caché manual para evitar cachear respuestas vacías.
+    Si Redis está vacío pero existe un snapshot en disco, lo sirve de inmediato
+    y refresca en segundo plano.
+
+    include=params,events,nodes,links,tables  secciones a enviar (por defecto todas)
+    fields=id,name,date,...                   sub-campos de cada evento (por defecto todos)
     """
+    started = time.time()
     force_refresh = request.args.get('refresh', 'false').lower() == 'true'
-    cache_key = 'monthly_ingestion_data'
+    include = parse_list_arg('include') or list(DATASET_SECTIONS)
+    fields = sorted(set(parse_list_arg('fields') or [])) or None
+    unknown = [section for section in include if section not in DATASET_SECTIONS]
+    if unknown:
+        return jsonify({'error': f"Unknown sections: {', '.join(unknown)}",
+                        'sections': list(DATASET_SECTIONS)}), 400
     
     # Intentar obtener del caché si no es un refresh forzado
     if not force_refresh:
-        cached_data = cache.get(cache_key)
+        version = current_dataset_version()
+        if version:
+            # Respuestas ya armadas de esta versión (solo en el L1 del worker)
+            body_key = f"dataset_body_{','.join(include)}__{','.join(fields or [])}"
+            body = l1_cache.get(body_key, version)
+            if body is None:
+                body = dataset_body(cached_fragment_getter(version, lambda: cache.get(MONTHLY_CACHE_KEY)),
+                                    include, fields, cached=True)
+                if body:
+                    body = body.encode('utf-8')
+                    l1_cache.put(body_key, body, version)
+            if body:
+                print(f"✅ Returning cached data (version {version})")
+                return dataset_response(body, include, fields, started)
+
+        cached_data = cache.get(MONTHLY_CACHE_KEY)
         if cached_data and cached_data.get('events') and len(cached_data.get('events', [])) > 0:
             print(f"✅ Returning cached data: {len(cached_data.get('events', []))} events")
-            cached_data['cached'] = True
-            return jsonify(cached_data)
-        else:
-            print("⚠️ Cache empty or invalid, fetching fresh data...")
+            version = dataset_version(record_dataset_version(cached_data))
+            body = dataset_body(cached_fragment_getter(version, lambda: cached_data), include, fields, cached=True)
+            return dataset_response(body, include, fields, started)
+
+        snapshot = restore_from_snapshot()
+        if snapshot:
+            start_background_refresh()
+            body = dataset_body(cached_fragment_getter(dataset_version(snapshot), lambda: snapshot),
+                                include, fields, cached=True)
+            return dataset_response(body, include, fields, started)
+        print("⚠️ Cache empty or invalid, fetching fresh data...")
     else:
         print("🔄 Force refresh requested, fetching fresh data...")
     
     print("⚙️ Monthly ingestion endpoint called - PROCESSING (not from cache)")
     try:
-        # First, fetch all available parameters
-        print("Fetching API parameters...")
-        api_params = fetch_api_params()
-        print(f"API params fetched: {list(api_params.keys()) if api_params else 'None'}")
-
-        # Then fetch all events
-        all_events = []
-        page = 1
-        per_page = 100
-
-        while True:
-            try:
-                params = {'page': page, 'per_page': per_page}
-                headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                response = requests.get(f"{API_BASE_URL}/events", params=params, headers=headers, timeout=120)
-                response.raise_for_status()
-                data = response.json()
-                events = data.get('events') or []
-                
-                if not events:
-                    break
-                
-                all_events.extend(events)
-                page += 1
-                print(f"Fetched page {page-1}, total events: {len(all_events)}")
-                
-            except requests.RequestException as e:
-                print(f"Error fetching page {page}: {e}")
-                break
-
-        print(f"✅ Total events fetched: {len(all_events)}")
-
-        # Extract params from events as fallback/supplement
-        print("Extracting params from events...")
-        try:
-            extracted_params = extract_params_from_events(all_events)
-            
-            # Merge API params with extracted params
-            if api_params:
-                merged_params = merge_params(api_params, extracted_params)
-            else:
-                merged_params = extracted_params
-            
-            print(f"Params ready: {len(merged_params.get('composers', []))} composers, {len(merged_params.get('cities', []))} cities")
-        
-        except Exception as e:
-            print(f"Error extracting params: {e}")
-            import traceback
-            traceback.print_exc()
-            merged_params = api_params or {'composers': [], 'cities': [], 'instruments': [], 'event_types': [], 'cycles': [], 'premiere_types': []}
-
-        # Process events to graph
-        print("Processing events into graph format...")
-        try:
-            nodes, links = process_events_to_graph(all_events)
-            print(f"✅ Graph complete: {len(nodes)} nodes, {len(links)} links")
-        except Exception as e:
-            print(f"Error processing graph: {e}")
-            import traceback
-            traceback.print_exc()
-            nodes, links = [], []
-
-        result = {
-            'params': merged_params,
-            'events': all_events,
-            'nodes': nodes,
-            'links': links,
-            'total_events': len(all_events),
-            'timestamp': int(time.time() * 1000),
-            'cached': False
-        }
-        
-        # Solo cachear si hay eventos válidos
-        if len(all_events) > 0:
-            cache.set(cache_key, result, timeout=31536000)  # 1 año
-            print(f"✅ Data cached successfully: {len(all_events)} events")
-        else:
-            print("⚠️ No events fetched, NOT caching empty response")
-        
-        return jsonify(result)
+        result = ingest_dataset()
+        body = dataset_body(lambda section, fields=None: serialize_section(result, section, fields),
+                            include, fields, cached=False)
+        return dataset_response(body, include, fields, started)
 
     except Exception as e:
         print(f"Error in monthly ingestion: {e}")
@@ -153,6 +1482,8 @@ def clear_cache():
     """Limpia todo el caché de Redis"""
     try:
         cache.clear()
+        l1_cache.clear()
+        publish_dataset_version(None)
         print("✅ Redis cache cleared successfully")
         return jsonify({
             'success': True,
@@ -170,23 +1501,35 @@ def clear_cache():
 def cache_status():
     """Muestra información sobre el estado del caché"""
     try:
-        cache_key = 'monthly_ingestion_data'
-        cached_data = cache.get(cache_key)
-        
         events_count = 0
         cache_timestamp = None
-        if cached_data:
-            events_count = len(cached_data.get('events', []))
-            cache_timestamp = cached_data.get('timestamp')
+        version = current_dataset_version()
+        meta = l1_get(fragment_key(version, 'meta'), version) if version else None
+        if meta:
+            # Metadatos desde el fragmento (L1): no hace falta leer el dataset completo
+            meta = json.loads(meta)
+            events_count = meta.get('total_events') or 0
+            cache_timestamp = meta.get('timestamp')
+        else:
+            cached_data = cache.get(MONTHLY_CACHE_KEY)
+            if cached_data:
+                events_count = len(cached_data.get('events', []))
+                cache_timestamp = cached_data.get('timestamp')
+
+        snapshots = list_snapshots()
         
         return jsonify({
             'redis_connected': True,
-            'cache_exists': cached_data is not None and events_count > 0,
+            'cache_exists': events_count > 0,
             'events_cached': events_count,
             'cache_timestamp': cache_timestamp,
-            'cache_timeout_seconds': 31536000,
+            'cache_timeout_seconds': MONTHLY_CACHE_TIMEOUT,
             'cache_timeout_days': 365,
-            'cache_prefix': app.config['CACHE_KEY_PREFIX']
+            'cache_prefix': app.config['CACHE_KEY_PREFIX'],
+            'dataset_version': version,
+            'l1_cache': l1_cache.stats(),
+            'snapshots': [os.path.basename(p) for p in snapshots],
+            'background_refresh_running': bool(cache.get(REFRESH_LOCK_KEY))
         })
     except Exception as e:
         return jsonify({
@@ -203,64 +1546,20 @@ def refresh_cache():
     """
     try:
         print("🔄 Refresh cache requested - clearing old cache...")
-        cache_key = 'monthly_ingestion_data'
-        cache.delete(cache_key)
+        cache.delete(MONTHLY_CACHE_KEY)
         
-        # Llamar al endpoint con refresh=true para obtener datos frescos
-        # Hacemos la llamada internamente
         print("🔄 Fetching fresh data from external API...")
-        
-        # Fetch fresh data
-        api_params = fetch_api_params()
-        all_events = []
-        page = 1
-        per_page = 100
-
-        while True:
-            try:
-                params = {'page': page, 'per_page': per_page}
-                headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                response = requests.get(f"{API_BASE_URL}/events", params=params, headers=headers, timeout=120)
-                response.raise_for_status()
-                data = response.json()
-                events = data.get('events') or []
-                
-                if not events:
-                    break
-                
-                all_events.extend(events)
-                page += 1
-                print(f"Fetched page {page-1}, total events: {len(all_events)}")
-                
-            except requests.RequestException as e:
-                print(f"Error fetching page {page}: {e}")
-                break
+        result = ingest_dataset()
 
-        if len(all_events) > 0:
-            # Process and cache
-            extracted_params = extract_params_from_events(all_events)
-            merged_params = merge_params(api_params, extracted_params) if api_params else extracted_params
-            nodes, links = process_events_to_graph(all_events)
-            
-            result = {
-                'params': merged_params,
-                'events': all_events,
-                'nodes': nodes,
-                'links': links,
-                'total_events': len(all_events),
-                'timestamp': int(time.time() * 1000),
-                'cached': False
-            }
-            
-            cache.set(cache_key, result, timeout=31536000)
-            print(f"✅ Cache refreshed successfully: {len(all_events)} events")
+        if result['total_events'] > 0:
+            print(f"✅ Cache refreshed successfully: {result['total_events']} events")
             
             return jsonify({
                 'success': True,
-                'message': f'Cache actualizado exitosamente con {len(all_events)} eventos',
-                'events_count': len(all_events),
-                'nodes_count': len(nodes),
-                'links_count': len(links),
+                'message': f"Cache actualizado exitosamente con {result['total_events']} eventos",
+                'events_count': result['total_events'],
+                'nodes_count': len(result['nodes']),
+                'links_count': len(result['links']),
                 'timestamp': result['timestamp']
             })
         else:
@@ -284,8 +1583,7 @@ def get_params():
     """Fetch all available filter parameters from the API"""
     try:
         full_content = request.args.get('full_content', 'true')
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(f"{PARAMS_URL}?full_content={full_content}", headers=headers, timeout=120)
+        response = upstream_get(PARAMS_URL, params={'full_content': full_content})
         response.raise_for_status()
         return jsonify(response.json())
     except requests.RequestException as e:
@@ -300,12 +1598,10 @@ def get_all_filter_values():
     adicionales si es necesario para obtener listas completas.
     """
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        
         # Obtener parámetros base
         params_data = {}
         try:
-            params_response = requests.get(f"{PARAMS_URL}?full_content=true", headers=headers, timeout=10)
+            params_response = upstream_get(PARAMS_URL, params={'full_content': 'true'}, timeout=10)
             params_response.raise_for_status()
             params_data = params_response.json()
         except requests.RequestException as e:
@@ -337,11 +1633,9 @@ def get_all_filter_values():
         
         # Extraer valores adicionales desde eventos si es necesario
         print("Fetching sample events to extract additional values...")
-        events_response = requests.get(
-            f"{API_BASE_URL}/events", 
-            params={'page': 1, 'per_page': 100},
-            headers=headers,
-            timeout=120
+        events_response = upstream_get(
+            f"{API_BASE_URL}/events",
+            params={'page': 1, 'per_page': 100}
         )
         
         if events_response.status_code == 200:
@@ -498,11 +1792,10 @@ def normalize_values(values):
 def fetch_api_params():
     """Fetch all available parameters from the API"""
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
         url = f"{PARAMS_URL}?full_content=true"
         print(f"Fetching params from: {url}")
         
-        response = requests.get(url, headers=headers, timeout=120)
+        response = upstream_get(PARAMS_URL, params={'full_content': 'true'})
         print(f"Params response status: {response.status_code}")
         
         if response.status_code != 200:
@@ -690,6 +1983,18 @@ def extract_params_from_events(events):
         'premiere_types': [{'id': i+1, 'name': n} for i, n in enumerate(sorted(premiere_types))]
     }
 
+# ==================== CAMPOS DERIVADOS (CALCULADOS UNA VEZ POR DATASET) ====================
+# Antes la vista de tabla recalculaba todo esto en cada carga de página y en cada
+# navegador. Ahora se calcula durante la ingesta y viaja con el dataset.
+DERIVED_FIELDS_VERSION = 2  # 2: ciudad con la regla del cliente (location_city_name)
+CITY_AFTER_COMMA_RE = re.compile(r',\s*([^(]+)\s*\(')
+CITY_BEFORE_PAREN_RE = re.compile(r'^([^(]+)\s*\(')
+ISO_DATE_RE = re.compile(r'^\s*(\d{4})[-/](\d{1,2})[-/](\d{1,2})')
+DMY_DATE_RE = re.compile(r'^\s*(\d{1,2})[-/](\d{1,2})[-/](\d{4})')
+YEAR_RE = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
 def extract_city_name(location_str):
     """Extract city name from location string"""
     if not location_str or not isinstance(location_str, str):
@@ -698,12 +2003,11 @@ def extract_city_name(location_str):
     try:
         # Format: "Venue, City (Country)"
         if '(' in location_str and ')' in location_str:
-            import re
-            match = re.search(r',\s*([^(]+)\s*\(', location_str)
+            match = CITY_AFTER_COMMA_RE.search(location_str)
             if match:
                 return match.group(1).strip()
             # Format: "City (Country)"
-            match = re.search(r'^([^(]+)\s*\(', location_str)
+            match = CITY_BEFORE_PAREN_RE.search(location_str)
             if match:
                 return match.group(1).strip()
         
@@ -717,6 +2021,177 @@ def extract_city_name(location_str):
     
     return None
 
+
+def clean_duplicate_name(name):
+    """Limpia nombres duplicados (ej: "Nombre - Nombre" -> "Nombre")"""
+    if name and ' - ' in name:
+        parts = name.split(' - ')
+        if len(parts) == 2 and parts[0].strip() == parts[1].strip():
+            return parts[0].strip()
+    return name
+
+
+def parse_event_date(date_str):
+    """Devuelve (día, mes, año) desde 'YYYY-MM-DD' o 'DD-MM-YYYY', o None"""
+    if not date_str or not isinstance(date_str, str):
+        return None
+    match = ISO_DATE_RE.match(date_str)
+    if match:
+        return int(match.group(3)), int(match.group(2)), int(match.group(1))
+    match = DMY_DATE_RE.match(date_str)
+    if match:
+        return int(match.group(1)), int(match.group(2)), int(match.group(3))
+    return None
+
+
+def normalize_year(event):
+    """Año del evento como int: campo 'year', o extraído de 'date'. None si no hay."""
+    year = event.get('year')
+    if year:
+        try:
+            return int(year)
+        except (TypeError, ValueError):
+            pass
+
+    date_str = event.get('date')
+    parsed = parse_event_date(date_str)
+    if parsed:
+        return parsed[2]
+    if isinstance(date_str, str):
+        match = YEAR_RE.search(date_str)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def format_event_date(date_str):
+    """Formatea la fecha como dd-mm-aaaa (es-CL); deja el texto original si no se reconoce"""
+    parsed = parse_event_date(date_str)
+    if not parsed:
+        return date_str or None
+    day, month, year = parsed
+    return f"{day:02d}-{month:02d}-{year}"
+
+
+def location_city_name(location):
+    """
+    Ciudad de una ubicación, con la misma regla que extractCityName del cliente:
+    'Recinto, Ciudad (País)' -> segundo tramo antes del paréntesis; sin coma, lo
+    anterior al paréntesis o la ubicación completa ("Teatro Oriente").
+    Es la única regla para la ciudad de cada evento y las tablas de ciudades y lugares.
+    """
+    if not location or not isinstance(location, str) or location == 'N/A':
+        return None
+    if ',' in location and '(' in location:
+        city = location.split(',')[1].split('(')[0]
+    elif '(' in location:
+        city = location.split('(')[0]
+    elif ',' in location:
+        city = location.split(',')[-1]
+    else:
+        city = location
+    return clean_duplicate_name(city.strip()) or None
+
+
+def split_location(location):
+    """
+    Separa 'Recinto, Ciudad (País)' en (recinto, ciudad) ya limpios. Como en el
+    cliente, una ubicación sin coma es solo recinto y su ciudad queda en 'N/A'.
+    """
+    if not location or location == 'N/A':
+        return 'N/A', 'N/A'
+    if ',' in location:
+        venue = clean_duplicate_name(location.split(',')[0].strip())
+        return venue, location_city_name(location) or 'N/A'
+    return clean_duplicate_name(location.strip()), 'N/A'
+
+
+def derive_event_fields(event):
+    """Campos de presentación de un evento (los que antes calculaba table-view.js)"""
+    participants = [p for p in (event.get('participants') or []) if isinstance(p, dict)]
+    program = [p for p in (event.get('program') or []) if isinstance(p, dict)]
+
+    genders = []
+    for participant in participants:
+        gender = participant.get('gender')
+        if gender and gender not in genders:
+            genders.append(gender)
+
+    venue, city = split_location(event.get('location'))
+    return {
+        'participants_count': len(participants),
+        'genders': ', '.join(genders) or 'N/A',
+        'date_display': format_event_date(event.get('date')) or 'N/A',
+        'year': normalize_year(event),
+        'venue': venue,
+        'city': city,
+        'program_summary': ', '.join(p.get('piece_name') or '' for p in program) or 'N/A'
+    }
+
+
+def derive_dataset_fields(events):
+    """
+    Agrega event['derived'] a cada evento y construye las tablas agregadas
+    (participantes, compositores, ciudades, lugares) que usa la vista de tabla.
+    """
+    participants = {}
+    composers = {}
+    cities = {}
+    locations = {}
+
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        derived = derive_event_fields(event)
+        event['derived'] = derived
+
+        for participant in event.get('participants') or []:
+            if not isinstance(participant, dict):
+                continue
+            name = participant.get('name')
+            if name not in participants:
+                participants[name] = {
+                    'name': name,
+                    'activity': participant.get('activity') or 'N/A',
+                    'gender': participant.get('gender') or 'N/A',
+                    'events_count': 0
+                }
+            participants[name]['events_count'] += 1
+
+        event_composers = set()
+        for piece in event.get('program') or []:
+            if not isinstance(piece, dict):
+                continue
+            for composer in piece.get('composers') or []:
+                if composer and composer != 'Desconocido':
+                    if composer not in composers:
+                        composers[composer] = {'name': composer, 'pieces_count': 0, 'events_count': 0}
+                    composers[composer]['pieces_count'] += 1
+                    event_composers.add(composer)
+        for composer in event_composers:
+            composers[composer]['events_count'] += 1
+
+        # No usar derived['city']: sin coma queda en 'N/A' y el evento no se contaría
+        city = location_city_name(event.get('location'))
+        if city:
+            if city not in cities:
+                cities[city] = {'name': city, 'events_count': 0}
+            cities[city]['events_count'] += 1
+
+        if derived['venue'] != 'N/A':
+            # Clave de deduplicación: ignorar espacios extras y mayúsculas
+            venue_key = WHITESPACE_RE.sub(' ', derived['venue'].lower()).strip()
+            if venue_key not in locations:
+                locations[venue_key] = {'name': derived['venue'], 'city': derived['city'], 'events_count': 0}
+            locations[venue_key]['events_count'] += 1
+
+    return {
+        'participants': list(participants.values()),
+        'composers': list(composers.values()),
+        'cities': list(cities.values()),
+        'locations': list(locations.values())
+    }
+
 @app.route('/api/proxy/events', methods=['GET'])
 def proxy_events():
     """Proxy endpoint to avoid CORS issues"""
@@ -724,8 +2199,7 @@ def proxy_events():
         params = request.args.to_dict()
         print(f"Proxy: request params: {params}")
         
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(f"{API_BASE_URL}/events", params=params, headers=headers, timeout=120)
+        response = upstream_get(f"{API_BASE_URL}/events", params=params)
         
         print(f"Proxy: response status: {response.status_code}")
         
@@ -747,6 +2221,10 @@ def default_data():
         with open('concert_data_20251117_202521.json', 'r', encoding='utf-8') as f:
             return jsonify(json.load(f))
     except FileNotFoundError:
+        # Sin archivo fijo: usar el snapshot más reciente de una ingesta real
+        snapshot = load_latest_snapshot()
+        if snapshot:
+            return jsonify(snapshot)
         return jsonify({'error': 'Default data file not found'}), 404
     except json.JSONDecodeError:
         return jsonify({'error': 'Invalid JSON'}), 500
@@ -778,13 +2256,12 @@ def fetch_paginated_events(params, max_events):
     all_events = []
     page = 1
     per_page = min(100, max_events)
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
 
     while len(all_events) < max_events:
         params['page'] = page
         params['per_page'] = per_page
         
-        response = requests.get(f"{API_BASE_URL}/events", params=params, headers=headers, timeout=120)
+        response = upstream_get(f"{API_BASE_URL}/events", params=params)
         response.raise_for_status()
         
         events = response.json().get('events', [])
@@ -798,6 +2275,547 @@ def fetch_paginated_events(params, max_events):
 
     return all_events[:max_events]
 
+# ==================== CONSTRUCCIÓN PARALELA DEL GRAFO ====================
+# Para corpus grandes el grafo se construye por fragmentos en un pool de procesos:
+# cada proceso arma sus propios nodos/enlaces y luego se fusionan deduplicando por id.
+# El resultado es idéntico al de process_events_to_graph() secuencial.
+# Solo lo usa ingest.py: dentro de un worker web (con hilos o greenlets de gevent)
+# hacer fork copia locks tomados por otros hilos y el hijo puede quedar colgado,
+# así que build_dataset en el servidor siempre construye secuencialmente.
+GRAPH_PARALLEL_MIN_EVENTS = int(os.environ.get('GRAPH_PARALLEL_MIN_EVENTS', 20000))
+GRAPH_BUILD_PROCESSES = int(os.environ.get('GRAPH_BUILD_PROCESSES', 0))  # 0 = todos los núcleos
+
+
+def build_graph(events, processes=None, parallel=False):
+    """
+    Construye el grafo. Con parallel=True (solo desde la CLI de ingesta) usa un
+    pool de procesos si el corpus es grande; si no, secuencialmente.
+    """
+    processes = processes or GRAPH_BUILD_PROCESSES or os.cpu_count() or 1
+    if not parallel or processes < 2 or len(events) < GRAPH_PARALLEL_MIN_EVENTS:
+        return process_events_to_graph(events)
+    try:
+        return process_events_to_graph_parallel(events, processes)
+    except Exception as e:
+        print(f"⚠️ Parallel graph build failed ({e}), falling back to sequential")
+        return process_events_to_graph(events)
+
+
+_shard_source_events = None
+
+
+def _graph_for_range(bounds):
+    """Tarea de un proceso hijo: grafo parcial de events[start:end] (heredados vía fork)"""
+    start, end = bounds
+    return process_events_to_graph(_shard_source_events[start:end])
+
+
+def process_events_to_graph_parallel(events, processes):
+    """Fragmenta los eventos en bloques contiguos y los procesa en un pool de procesos"""
+    global _shard_source_events
+    started = time.time()
+    shard_count = min(processes * 2, len(events))
+    shard_size = -(-len(events) // shard_count)
+    bounds = [(i, min(i + shard_size, len(events))) for i in range(0, len(events), shard_size)]
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Con fork los hijos heredan la lista de eventos: solo viajan los rangos,
+        # y no se reimporta app.py (ni su warm start) en cada hijo
+        _shard_source_events = events
+        try:
+            with ProcessPoolExecutor(max_workers=processes,
+                                     mp_context=multiprocessing.get_context('fork')) as pool:
+                partials = list(pool.map(_graph_for_range, bounds))
+        finally:
+            _shard_source_events = None
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            partials = list(pool.map(process_events_to_graph, [events[a:b] for a, b in bounds]))
+
+    nodes, links = merge_graph_shards(partials)
+    print(f"⚡ Parallel graph build: {len(events)} events, {len(bounds)} shards, "
+          f"{processes} processes in {time.time() - started:.2f}s")
+    return nodes, links
+
+
+def merge_graph_shards(partials):
+    """Fusiona grafos parciales en orden, conservando la primera aparición de cada nodo"""
+    nodes = []
+    links = []
+    node_ids = set()
+    for shard_nodes, shard_links in partials:
+        for node in shard_nodes:
+            if node['id'] not in node_ids:
+                node_ids.add(node['id'])
+                nodes.append(node)
+        links.extend(shard_links)
+    return nodes, links
+
+
+# ==================== ÍNDICE TEMPORAL (GRAFO POR AÑO) ====================
+# Los eventos se agrupan por año normalizado y cada año guarda su propio
+# subgrafo (los nodos y enlaces que aportan sus eventos). Un rango
+# [year_from, year_to] se arma fusionando solo los años del rango, así que el
+# costo depende del tamaño del resultado y no del grafo completo.
+# El índice se construye una vez por versión del dataset, en cada proceso.
+
+
+def build_temporal_index(events):
+    """{'years': [años ordenados], 'slices': [(nodos, enlaces) por año], 'undated': (nodos, enlaces)}"""
+    by_year = {}
+    undated = []
+    for event in events:
+        if not event:
+            continue
+        year = normalize_year(event)
+        if year is None:
+            undated.append(event)
+        else:
+            by_year.setdefault(year, []).append(event)
+
+    years = sorted(by_year)
+    return {
+        'years': years,
+        'events_count': [len(by_year[y]) for y in years],
+        'slices': [process_events_to_graph(by_year[y]) for y in years],
+        'undated': process_events_to_graph(undated),
+        'undated_count': len(undated)
+    }
+
+
+temporal_index = VersionedIndex('Temporal index', lambda data, key: build_temporal_index(data.get('events') or []))
+
+
+def year_range_bounds(index, year_from=None, year_to=None):
+    """Posiciones [lo, hi) de los años del índice dentro del rango (búsqueda binaria)"""
+    years = index['years']
+    lo = bisect.bisect_left(years, year_from) if year_from is not None else 0
+    hi = bisect.bisect_right(years, year_to) if year_to is not None else len(years)
+    return lo, max(lo, hi)
+
+
+def graph_for_year_range(index, year_from=None, year_to=None, include_undated=False):
+    lo, hi = year_range_bounds(index, year_from, year_to)
+    slices = index['slices'][lo:hi]
+    if include_undated:
+        slices = slices + [index['undated']]
+    return merge_graph_shards(slices)
+
+
+@app.route('/api/graph_slice', methods=['GET'])
+def graph_slice():
+    """
+    Subgrafo de los eventos entre year_from y year_to (ambos opcionales e incluidos).
+    include_undated=true agrega los eventos sin año. Sirve también como cuadro de
+    una animación por años (year_from == year_to).
+    """
+    year_from = request.args.get('year_from', type=int)
+    year_to = request.args.get('year_to', type=int)
+    include_undated = request.args.get('include_undated', 'false').lower() == 'true'
+    try:
+        version, index = temporal_index.get()
+        if index is None:
+            return jsonify({'error': 'No dataset available yet'}), 503
+
+        nodes, links = graph_for_year_range(index, year_from, year_to, include_undated)
+        return jsonify({
+            'version': version,
+            'year_from': year_from,
+            'year_to': year_to,
+            'nodes': nodes,
+            'links': links
+        })
+    except Exception as e:
+        print(f"Error building graph slice: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/graph_timeline', methods=['GET'])
+def graph_timeline():
+    """Años disponibles con su cantidad de eventos, nodos y enlaces (para la línea de tiempo)"""
+    try:
+        version, index = temporal_index.get()
+        if index is None:
+            return jsonify({'error': 'No dataset available yet'}), 503
+
+        return jsonify({
+            'version': version,
+            'years': [
+                {'year': year, 'events': count, 'nodes': len(nodes), 'links': len(links)}
+                for year, count, (nodes, links) in zip(index['years'], index['events_count'], index['slices'])
+            ],
+            'undated_events': index['undated_count']
+        })
+    except Exception as e:
+        print(f"Error building graph timeline: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== PROYECCIONES DE CO-OCURRENCIA ====================
+# A partir de la matriz de incidencia evento x entidad B (binaria), la
+# proyección entidad-entidad es Bᵀ·B: el peso de (a, b) es la cantidad de
+# eventos que comparten. Para composer_venue es Bᵀ_compositor · B_lugar.
+# Con numpy/scipy se calcula como producto disperso; sin ellos, contando
+# pares evento por evento (mismo resultado).
+PROJECTION_KINDS = {
+    'participant_participant': ('participant', 'participant'),
+    'composer_composer': ('composer', 'composer'),
+    'composer_venue': ('composer', 'venue')
+}
+PROJECTION_DEFAULT_TOP_K = 10
+
+
+def event_entities(event, entity_type):
+    """Nombres distintos de un tipo de entidad en un evento"""
+    if entity_type == 'participant':
+        return {p.get('name') for p in event.get('participants') or []
+                if isinstance(p, dict) and p.get('name')}
+    if entity_type == 'composer':
+        return {c for piece in event.get('program') or [] if isinstance(piece, dict)
+                for c in piece.get('composers') or [] if c and c != 'Desconocido'}
+    derived = event.get('derived')
+    venue = derived['venue'] if derived else split_location(event.get('location'))[0]
+    return {venue} if venue != 'N/A' else set()
+
+
+def incidence_lists(events, entity_type):
+    """Entidades por evento y el índice nombre -> columna"""
+    columns = {}
+    per_event = []
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        names = event_entities(event, entity_type)
+        per_event.append(sorted(columns.setdefault(name, len(columns)) for name in sorted(names)))
+    return per_event, list(columns)
+
+
+def incidence_matrix(per_event, n_columns):
+    rows = [i for i, cols in enumerate(per_event) for _ in cols]
+    cols = [c for event_cols in per_event for c in event_cols]
+    return sparse.csr_matrix((np.ones(len(cols), dtype=np.int32), (rows, cols)),
+                             shape=(len(per_event), n_columns))
+
+
+def projection_edges_sparse(left, right, n_left, n_right, symmetric):
+    product = (incidence_matrix(left, n_left).T @ incidence_matrix(right, n_right)).tocoo()
+    mask = product.row < product.col if symmetric else slice(None)
+    rows, cols, weights = product.row[mask], product.col[mask], product.data[mask]
+    # Orden por peso descendente (y por par, para que sea determinista)
+    order = np.lexsort((cols, rows, -weights))
+    return rows[order], cols[order], weights[order]
+
+
+def projection_edges_python(left, right, symmetric):
+    counts = {}
+    for left_cols, right_cols in zip(left, right):
+        pairs = itertools.combinations(left_cols, 2) if symmetric else itertools.product(left_cols, right_cols)
+        for pair in pairs:
+            counts[pair] = counts.get(pair, 0) + 1
+    edges = sorted(((a, b, w) for (a, b), w in counts.items()), key=lambda e: (-e[2], e[0], e[1]))
+    return [e[0] for e in edges], [e[1] for e in edges], [e[2] for e in edges]
+
+
+def build_projection(events, kind):
+    """
+    Aristas ponderadas como tres columnas paralelas (rows, cols, weights) ordenadas
+    por peso descendente: arrays de numpy con scipy, listas sin él.
+    """
+    left_type, right_type = PROJECTION_KINDS[kind]
+    symmetric = left_type == right_type
+    left, left_labels = incidence_lists(events, left_type)
+    if symmetric:
+        right, right_labels = left, left_labels
+    else:
+        right, right_labels = incidence_lists(events, right_type)
+
+    if sparse is not None:
+        rows, cols, weights = projection_edges_sparse(left, right, len(left_labels), len(right_labels), symmetric)
+    else:
+        rows, cols, weights = projection_edges_python(left, right, symmetric)
+    return {
+        'kind': kind,
+        'types': (left_type, right_type),
+        'labels': (left_labels, right_labels),
+        'rows': rows,
+        'cols': cols,
+        'weights': weights
+    }
+
+
+# Una proyección por tipo, calculada una vez por versión publicada
+projections = VersionedIndex(f"Projection ({'sparse' if sparse is not None else 'python'})",
+                             lambda data, kind: build_projection(data.get('events') or [], kind))
+
+
+def group_ranks(keys):
+    """Para cada posición, cuántas veces apareció antes la misma clave"""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.r_[0, np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1]
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(keys)]))
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[order] = np.arange(len(keys)) - group_start
+    return ranks
+
+
+def prune_top_k(proj, top_k, min_weight=1):
+    """
+    Índices de las aristas que están entre las top_k más pesadas de alguno de sus
+    extremos. Las aristas vienen ordenadas por peso descendente.
+    """
+    rows, cols, weights = proj['rows'], proj['cols'], proj['weights']
+    # En proyecciones simétricas rows y cols son índices del mismo conjunto de nodos
+    symmetric = proj['types'][0] == proj['types'][1]
+
+    if sparse is not None and isinstance(weights, np.ndarray):
+        count = int(np.searchsorted(-weights, -min_weight, side='right'))
+        if not top_k or count == 0:
+            return range(count)
+        if symmetric:
+            endpoints = np.column_stack((rows[:count], cols[:count])).ravel()
+            ranks = group_ranks(endpoints).reshape(-1, 2)
+            keep = (ranks[:, 0] < top_k) | (ranks[:, 1] < top_k)
+        else:
+            keep = (group_ranks(rows[:count]) < top_k) | (group_ranks(cols[:count]) < top_k)
+        return np.flatnonzero(keep).tolist()
+
+    rank_left = {}
+    rank_right = rank_left if symmetric else {}
+    kept = []
+    for index, (i, j, weight) in enumerate(zip(rows, cols, weights)):
+        if weight < min_weight:
+            break
+        ri = rank_left.get(i, 0)
+        rj = rank_right.get(j, 0)
+        rank_left[i] = ri + 1
+        rank_right[j] = rj + 1
+        if not top_k or ri < top_k or rj < top_k:
+            kept.append(index)
+    return kept
+
+
+def projection_node_id(entity_type, name):
+    return f"{entity_type}_{hash_string(name)}"
+
+
+@app.route('/api/projection/<kind>', methods=['GET'])
+def projection(kind):
+    """
+    Grafo de co-ocurrencia ponderado: participant_participant, composer_composer
+    o composer_venue. top_k (0 = sin poda) y min_weight filtran las aristas.
+    """
+    if kind not in PROJECTION_KINDS:
+        return jsonify({'error': f'Unknown projection: {kind}',
+                        'kinds': list(PROJECTION_KINDS)}), 404
+    top_k = request.args.get('top_k', PROJECTION_DEFAULT_TOP_K, type=int)
+    min_weight = request.args.get('min_weight', 1, type=int)
+    try:
+        version, proj = projections.get(kind)
+        if proj is None:
+            return jsonify({'error': 'No dataset available yet'}), 503
+
+        kept = prune_top_k(proj, top_k, min_weight)
+        left_type, right_type = proj['types']
+        left_labels, right_labels = proj['labels']
+
+        nodes = {}
+        links = []
+        for index in kept:
+            i, j, weight = int(proj['rows'][index]), int(proj['cols'][index]), int(proj['weights'][index])
+            source = projection_node_id(left_type, left_labels[i])
+            target = projection_node_id(right_type, right_labels[j])
+            for node_id, entity_type, label in ((source, left_type, left_labels[i]),
+                                                (target, right_type, right_labels[j])):
+                if node_id not in nodes:
+                    nodes[node_id] = {'id': node_id, 'label': label, 'type': entity_type, 'weight': 0}
+                nodes[node_id]['weight'] += weight
+            links.append({'source': source, 'target': target, 'weight': weight})
+
+        return jsonify({
+            'version': version,
+            'kind': kind,
+            'top_k': top_k,
+            'min_weight': min_weight,
+            'total_edges': len(proj['weights']),
+            'nodes': list(nodes.values()),
+            'links': links
+        })
+    except Exception as e:
+        print(f"Error building projection {kind}: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== CAMINOS ENTRE ENTIDADES ====================
+# Lista de adyacencia no dirigida (índices enteros) construida una vez por
+# versión del dataset. Las consultas usan BFS bidireccional y, para k > 1,
+# el algoritmo de Yen sobre ese mismo BFS. Los nodos de tipos "hub"
+# (tipo de evento, ciclo...) pueden excluirse como intermedios.
+PATH_DEFAULT_SKIP_TYPES = ('event_type', 'cycle', 'premiere_type')
+PATH_MAX_K = 10
+def build_path_index(nodes, links):
+    ids = [node['id'] for node in nodes]
+    position = {node_id: i for i, node_id in enumerate(ids)}
+    neighbors = [set() for _ in ids]
+    edge_links = {}
+    for link in links:
+        a = position.get(link['source'])
+        b = position.get(link['target'])
+        if a is None or b is None or a == b:
+            continue
+        neighbors[a].add(b)
+        neighbors[b].add(a)
+        edge_links.setdefault((a, b) if a < b else (b, a), link)
+    return {
+        'nodes': nodes,
+        'position': position,
+        'types': [node.get('type') for node in nodes],
+        'adjacency': [sorted(n) for n in neighbors],
+        'edge_links': edge_links
+    }
+
+
+# Adyacencia de la versión publicada (se reconstruye si cambió la versión)
+path_index = VersionedIndex('Path index',
+                            lambda data, key: build_path_index(data.get('nodes') or [], data.get('links') or []))
+
+
+def edge_id(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+def bidirectional_bfs(index, source, target, skip_types=(), removed_nodes=(), removed_edges=()):
+    """Camino más corto source -> target como lista de índices, o None"""
+    if source == target:
+        return [source]
+    adjacency = index['adjacency']
+    types = index['types']
+
+    parents = {source: None}
+    children = {target: None}
+    frontier, backward = [source], [target]
+
+    def expand(layer, seen, other):
+        next_layer = []
+        for u in layer:
+            for v in adjacency[u]:
+                if v in seen or v in removed_nodes or edge_id(u, v) in removed_edges:
+                    continue
+                if v in other:
+                    return u, v, next_layer
+                if types[v] in skip_types:
+                    continue
+                seen[v] = u
+                next_layer.append(v)
+        return None, None, next_layer
+
+    while frontier and backward:
+        # Expandir siempre la frontera más chica
+        if len(frontier) <= len(backward):
+            u, v, frontier = expand(frontier, parents, children)
+            meet_forward, meet_backward = u, v
+        else:
+            u, v, backward = expand(backward, children, parents)
+            meet_forward, meet_backward = v, u
+        if meet_forward is not None:
+            path = []
+            node = meet_forward
+            while node is not None:
+                path.append(node)
+                node = parents[node]
+            path.reverse()
+            node = meet_backward
+            while node is not None:
+                path.append(node)
+                node = children[node]
+            return path
+    return None
+
+
+def k_shortest_paths(index, source, target, k=1, skip_types=()):
+    """Algoritmo de Yen: hasta k caminos simples, del más corto al más largo"""
+    first = bidirectional_bfs(index, source, target, skip_types)
+    if not first:
+        return []
+    paths = [first]
+    candidates = []
+    seen = {tuple(first)}
+    while len(paths) < k:
+        last = paths[-1]
+        for i in range(len(last) - 1):
+            spur = last[i]
+            root = last[:i + 1]
+            removed_edges = {edge_id(p[i], p[i + 1]) for p in paths if len(p) > i + 1 and p[:i + 1] == root}
+            spur_path = bidirectional_bfs(index, spur, target, skip_types,
+                                          removed_nodes=set(root[:-1]), removed_edges=removed_edges)
+            if spur_path:
+                candidate = tuple(root[:-1] + spur_path)
+                if candidate not in seen:
+                    seen.add(candidate)
+                    heapq.heappush(candidates, (len(candidate), candidate))
+        if not candidates:
+            break
+        paths.append(list(heapq.heappop(candidates)[1]))
+    return paths
+
+
+@app.route('/api/path', methods=['GET'])
+def path_between():
+    """
+    Caminos más cortos entre dos nodos del grafo (p. ej. composer_<hash> y participant_<hash>).
+    k: cantidad de caminos (1..10). skip_types: tipos que no pueden ser intermedios,
+    separados por coma (por defecto event_type,cycle,premiere_type; vacío = ninguno).
+    """
+    source_id = request.args.get('source')
+    target_id = request.args.get('target')
+    k = max(1, min(request.args.get('k', 1, type=int), PATH_MAX_K))
+    skip_arg = request.args.get('skip_types')
+    skip_types = set(PATH_DEFAULT_SKIP_TYPES) if skip_arg is None else {t for t in skip_arg.split(',') if t}
+
+    if not source_id or not target_id:
+        return jsonify({'error': 'source and target are required'}), 400
+    try:
+        version, index = path_index.get()
+        if index is None:
+            return jsonify({'error': 'No dataset available yet'}), 503
+
+        missing = [node_id for node_id in (source_id, target_id) if node_id not in index['position']]
+        if missing:
+            return jsonify({'error': 'Unknown node id', 'missing': missing}), 404
+
+        started = time.time()
+        paths = k_shortest_paths(index, index['position'][source_id], index['position'][target_id],
+                                 k, skip_types)
+        elapsed_ms = (time.time() - started) * 1000
+
+        nodes = {}
+        links = {}
+        for path in paths:
+            for i in path:
+                nodes.setdefault(i, index['nodes'][i])
+            for a, b in zip(path, path[1:]):
+                links.setdefault(edge_id(a, b), index['edge_links'][edge_id(a, b)])
+
+        print(f"🧭 Path {source_id} -> {target_id}: {len(paths)} path(s) in {elapsed_ms:.1f} ms")
+        return jsonify({
+            'version': version,
+            'source': source_id,
+            'target': target_id,
+            'skip_types': sorted(skip_types),
+            'paths': [[index['nodes'][i]['id'] for i in path] for path in paths],
+            'nodes': list(nodes.values()),
+            'links': list(links.values()),
+            'elapsed_ms': round(elapsed_ms, 2)
+        })
+    except Exception as e:
+        print(f"Error computing path: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 def process_events_to_graph(events):
     """Process events into graph nodes and links"""
     nodes = []
@@ -817,7 +2835,7 @@ def process_events_to_graph(events):
                 'id': event_id,
                 'label': event.get('name') or 'Evento',
                 'type': 'event',
-                'year': event.get('year') or (event.get('date') and event.get('date').split('-')[-1] if '-' in str(event.get('date')) else None), # ✅ MEJORADO: Extraer año de fecha si falta
+                'year': normalize_year(event),
                 'x': 0,
                 'y': 0,
                 'size': 10
@@ -976,5 +2994,12 @@ def hash_string(s):
         h &= 0xFFFFFFFF  # Keep as 32-bit unsigned
     return str(h)
 
+# Cargar el último snapshot si Redis arranca vacío (desactivable con WARM_START=0)
+if os.environ.get('WARM_START', '1') == '1':
+    warm_start()
+
+if L1_PUBSUB:
+    start_version_listener()
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Latencia y tamaño de respuesta de los endpoints que leen el dataset publicado,
+con el test client de Flask sobre un corpus sintético (no toca la API real).
+
+Ingiere --events eventos desde un stub local del upstream con ingest_dataset()
+y luego pide cada URL del grupo una vez en frío (construye índices/fragmentos)
+y --repeat veces en caliente. Grupos:
+
+  export       /api/export/...              (CSV, GraphML, GEXF en streaming)
+  slices       /api/graph_slice, /api/graph_timeline
+  projections  /api/projection/<kind>
+  paths        /api/path
+  payload      /api/monthly_ingestion con include/fields, /api/cache_status
+
+Uso:
+  python benchmarks/bench_endpoints.py
+  python benchmarks/bench_endpoints.py --groups slices paths --events 50000
+
+Para comparar con otra revisión: git worktree add /tmp/before <rev> y
+--app-dir /tmp/before (las URLs que esa revisión no tiene salen con su status).
+Sin Redis local usa CACHE_TYPE=SimpleCache, que también serializa los valores
+(pickle) en cada get/set como Redis.
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GROUPS = {
+    'export': [
+        '/api/export/events.csv',
+        '/api/export/links.csv',
+        '/api/export/graph.graphml',
+        '/api/export/graph.gexf',
+    ],
+    'slices': [
+        '/api/graph_slice?year_from=1960&year_to=1961',
+        '/api/graph_slice?year_from=1950&year_to=1955',
+        '/api/graph_timeline',
+    ],
+    'projections': [
+        '/api/projection/composer_composer?top_k=5',
+        '/api/projection/participant_participant?top_k=5',
+        '/api/projection/composer_venue?top_k=5',
+    ],
+    'paths': [
+        '/api/path?source={first}&target={last}&k=1',
+        '/api/path?source={first}&target={last}&k=3',
+        '/api/path?source={first}&target={last}&k=5',
+    ],
+    'payload': [
+        '/api/monthly_ingestion',
+        '/api/monthly_ingestion?include=params,events,tables',
+        '/api/monthly_ingestion?include=params,nodes,links',
+        '/api/monthly_ingestion?include=events&fields=id,name,date,location,event_type',
+        '/api/cache_status',
+    ],
+}
+
+
+def load_app(app_dir, events):
+    """Importa app.py de app_dir apuntando al stub, e ingiere el corpus"""
+    os.environ.setdefault('CACHE_TYPE', 'SimpleCache')
+    os.environ['WARM_START'] = '0'
+    os.environ['L1_PUBSUB'] = '0'
+    os.environ['SNAPSHOT_DIR'] = tempfile.mkdtemp(prefix='bench_snapshots_')
+    from corpus import start_upstream
+
+    server, base_url = start_upstream(events)
+    os.environ['API_BASE_URL'] = base_url
+    sys.path.insert(0, app_dir)
+    import app
+
+    # Revisiones anteriores tienen la URL fija: se reemplaza en el módulo
+    app.API_BASE_URL = base_url
+    if hasattr(app, 'PARAMS_URL'):
+        app.PARAMS_URL = f'{base_url}/status/get_params'
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.ingest_dataset()
+    print(f'ingest: {len(events)} events in {time.perf_counter() - started:.1f} s')
+    return app, server
+
+
+def path_endpoints(app):
+    data = app.cache.get(app.MONTHLY_CACHE_KEY)
+    ids = [node['id'] for node in data['nodes'] if node.get('type') == 'participant']
+    return {'first': ids[0], 'last': ids[-1]}
+
+
+def fetch(client, url):
+    """(status, bytes, chunks, ms) leyendo la respuesta completa, también en streaming"""
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # logs de la app
+        response = client.get(url, buffered=False)
+        size = chunks = 0
+        for chunk in response.response:
+            size += len(chunk)
+            chunks += 1
+        response.close()
+    return response.status_code, size, chunks, (time.perf_counter() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de endpoints sobre el dataset publicado')
+    parser.add_argument('--groups', nargs='+', choices=list(GROUPS), default=list(GROUPS))
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--app-dir', default=ROOT, help='checkout cuyo app.py se mide')
+    args = parser.parse_args(argv)
+
+    from corpus import make_events
+    app, server = load_app(os.path.abspath(args.app_dir), make_events(args.events))
+    client = app.app.test_client()
+    values = path_endpoints(app) if 'paths' in args.groups else {}
+
+    print(f"{'url':<80} {'status':>6} {'MB':>7} {'chunks':>6} {'cold ms':>8} "
+          f"{'median':>8} {'p95':>8} {'max':>8}")
+    try:
+        for group in args.groups:
+            for template in GROUPS[group]:
+                url = template.format(**values)
+                status, size, chunks, cold = fetch(client, url)
+                if status != 200:
+                    print(f'{url:<80} {status:>6}')
+                    continue
+                timings = sorted(fetch(client, url)[3] for _ in range(args.repeat))
+                p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+                print(f'{url:<80} {status:>6} {size / 1e6:>7.1f} {chunks:>6} {cold:>8.1f} '
+                      f'{statistics.median(timings):>8.1f} {p95:>8.1f} {timings[-1]:>8.1f}')
+    finally:
+        server.shutdown()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'peak RSS: {peak:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Construcción del grafo secuencial vs en pool de procesos (build_graph con
+parallel=True, como la usa ingest.py) sobre corpus sintéticos de varios tamaños.
+
+Para cada tamaño mide process_events_to_graph() y
+process_events_to_graph_parallel() con cada cantidad de procesos (mejor de
+--repeat), verifica que nodos y enlaces sean idénticos y reporta el speedup.
+
+Uso:
+  python benchmarks/bench_graph_build.py
+  python benchmarks/bench_graph_build.py --sizes 20000 80000 --processes 2 4 8
+
+Con un solo núcleo el pool solo agrega overhead: el speedup se mide en la
+máquina donde corre la ingesta.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Igual que ingest.py: sin warm start ni listener de pub/sub antes del fork
+os.environ.setdefault('CACHE_TYPE', 'SimpleCache')
+os.environ['WARM_START'] = '0'
+os.environ['L1_PUBSUB'] = '0'
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+from corpus import make_events  # noqa: E402
+
+
+def best_of(repeat, fn):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='Benchmark de construcción paralela del grafo')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[5000, 20000, 80000])
+    parser.add_argument('--processes', nargs='+', type=int,
+                        default=sorted({2, 4, cpus} - {0, 1}))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f'cpu_count={cpus} repeat={args.repeat}')
+    print(f"{'events':>8} {'processes':>9} {'seconds':>8} {'speedup':>8} {'equal':>6}")
+    for size in args.sizes:
+        events = make_events(size)
+        sequential, expected = best_of(args.repeat, lambda: app.process_events_to_graph(events))
+        print(f'{size:>8} {"seq":>9} {sequential:>8.2f} {1.0:>8.2f} {"-":>6}')
+        for processes in args.processes:
+            elapsed, result = best_of(
+                args.repeat, lambda: app.process_events_to_graph_parallel(events, processes))
+            print(f'{size:>8} {processes:>9} {elapsed:>8.2f} {sequential / elapsed:>8.2f} '
+                  f'{str(result == expected):>6}')
+
+
+if __name__ == '__main__':
+    main()
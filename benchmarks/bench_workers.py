@@ -0,0 +1,164 @@
+"""
+Throughput y latencia de cola de gunicorn con workers sync vs gevent contra
+un upstream lento local (no toca la API real).
+
+Levanta un stub HTTP con hilos que responde /events y /status/get_params
+después de --delay segundos, arranca gunicorn con gunicorn.conf.py apuntando
+API_BASE_URL al stub, y dispara --requests peticiones a /api/proxy/events con
+--concurrency clientes simultáneos.
+
+Uso:
+  python benchmarks/bench_workers.py
+  python benchmarks/bench_workers.py --modes gevent --delay 1 --concurrency 200
+
+Sin Redis local: CACHE_TYPE=SimpleCache (el proxy no usa la caché).
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_upstream(delay):
+    """Stub de la API: cada respuesta tarda `delay` segundos"""
+    body = json.dumps({
+        'events': [{'id': i, 'name': f'Concierto {i}'} for i in range(20)],
+        'pagination': {'total_events': 20, 'total_pages': 1, 'has_next': False}
+    }).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_gunicorn(mode, port, upstream_port, workers):
+    env = dict(os.environ,
+               GUNICORN_WORKER_CLASS=mode,
+               API_BASE_URL=f'http://127.0.0.1:{upstream_port}',
+               CACHE_TYPE=os.environ.get('CACHE_TYPE', 'SimpleCache'),
+               WARM_START='0')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '-w', str(workers),
+         '--access-logfile', '/dev/null', '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'gunicorn ({mode}) exited: {proc.stderr.read().decode()[-2000:]}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f'gunicorn ({mode}) did not start')
+
+
+def stop_gunicorn(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, total, concurrency, timeout):
+    def one(_):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                response.read()
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(lat for ok, lat in results if ok)
+    return {
+        'ok': len(latencies),
+        'errors': total - len(latencies),
+        'elapsed_s': elapsed,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de workers sync vs gevent')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gevent'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.5, help='latencia del upstream (s)')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args(argv)
+
+    upstream = start_upstream(args.delay)
+    upstream_port = upstream.server_address[1]
+    print(f'upstream delay={args.delay}s workers={args.workers} '
+          f'requests={args.requests} concurrency={args.concurrency}')
+    print(f"{'mode':<8} {'ok':>5} {'err':>4} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    try:
+        for mode in args.modes:
+            port = free_port()
+            proc = start_gunicorn(mode, port, upstream_port, args.workers)
+            try:
+                url = f'http://127.0.0.1:{port}/api/proxy/events?page=1&per_page=20'
+                run_load(url, args.workers * 2, args.workers, args.timeout)  # calentamiento
+                r = run_load(url, args.requests, args.concurrency, args.timeout)
+            finally:
+                stop_gunicorn(proc)
+            print(f"{mode:<8} {r['ok']:>5} {r['errors']:>4} {r['rps']:>8.1f} "
+                  f"{r['p50_ms']:>9.0f} {r['p95_ms']:>9.0f} {r['p99_ms']:>9.0f}")
+    finally:
+        upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Corpus sintético y API falsa para los benchmarks (no tocan la API real).
+
+Los eventos tienen la forma de /events del upstream: fechas dd-mm-aaaa entre
+1945 y 1995, ubicaciones "Teatro, Ciudad (País)", participantes y programa
+con compositores repetidos, para que el grafo tenga nodos compartidos.
+"""
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CITIES = ['Santiago', 'Valparaíso', 'Concepción', 'Viña del Mar']
+ACTIVITIES = ['Intérprete - Piano', 'Director - Ninguno', 'Intérprete - Violín']
+
+
+def make_events(n, seed=1, people=None, composers=None):
+    """n eventos reproducibles; people/composers escalan con n si no se indican"""
+    rng = random.Random(seed)
+    people = people or max(200, n // 100)
+    composers = composers or max(40, n // 500)
+    events = []
+    for i in range(1, n + 1):
+        events.append({
+            'id': i,
+            'name': f'Concierto {i}',
+            'date': f'{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(1945, 1995)}',
+            'location': f'Teatro {i % 7}, {rng.choice(CITIES)} (Chile)',
+            'event_type': rng.choice(['Concierto', 'Ópera', 'Recital']),
+            'cycle': rng.choice(['Ninguno', 'Temporada A', 'Temporada B']),
+            'participants': [{'name': f'Persona {rng.randrange(people)}',
+                              'activity': rng.choice(ACTIVITIES),
+                              'gender': rng.choice(['Masculino', 'Femenino'])}
+                             for _ in range(rng.randint(1, 4))],
+            'program': [{'piece_name': f'Obra {rng.randint(1, 300)}',
+                         'composers': [f'Compositor {rng.randrange(composers)}'],
+                         'premiere_type': rng.choice(['Estreno Mundial', 'Estreno Nacional', None])}
+                        for _ in range(rng.randint(1, 3))]
+        })
+    return events
+
+
+def start_upstream(events):
+    """Stub HTTP de /events paginado y /status/get_params. Devuelve (server, base_url)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path.endswith('/status/get_params'):
+                return self.reply({'composers': []})
+            page = int(query.get('page', 1))
+            per_page = int(query.get('per_page', 100))
+            total_pages = -(-len(events) // per_page)
+            self.reply({
+                'events': events[(page - 1) * per_page:page * per_page],
+                'pagination': {'total_events': len(events), 'total_pages': total_pages,
+                               'current_page': page, 'per_page': per_page,
+                               'has_next': page < total_pages}
+            })
+
+        def reply(self, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/api'
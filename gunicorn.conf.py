@@ -1,4 +1,5 @@
 # Gunicorn configuration file
+import os
 
 # Bind to all interfaces on port 5000
 bind = "0.0.0.0:5000"
@@ -6,6 +7,29 @@ bind = "0.0.0.0:5000"
 # Number of worker processes
 workers = 4
 
+# Worker class. "sync" blocks a whole worker while it waits on the external API,
+# so a handful of slow upstream calls can starve the server. Set
+# GUNICORN_WORKER_CLASS=gevent to serve with cooperative workers: every call to
+# the external API (and to Redis) yields while waiting, and a single process can
+# keep hundreds of requests in flight. "gthread" is also supported.
+# Do not enable preload_app with gevent: the monkey patching must happen before
+# app.py imports requests/redis.
+# gevent only helps while waiting on I/O. CPU-bound work runs on the worker's
+# single OS thread and blocks every request of that worker until it finishes:
+# build_dataset (params, derived fields, graph), the dataset manifest hashing,
+# snapshot compression, and the background refresh (a greenlet under gevent,
+# not a real thread). With gevent, run refreshes out of process with ingest.py
+# (e.g. from cron) instead of /api/refresh_cache or the warm-start refresh.
+# Benchmark both modes against a slow local upstream with
+# benchmarks/bench_workers.py.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+
+# Max simultaneous clients per worker (gevent only)
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Threads per worker (gthread only)
+threads = int(os.environ.get("GUNICORN_THREADS", 32 if worker_class == "gthread" else 1))
+
 # Timeout for worker processes (5 minutes)
 timeout = 3000
 
@@ -0,0 +1,346 @@
+"""
+Pipeline de ingesta por línea de comandos, separado de los workers web.
+
+Etapas:
+  fetch      descarga /events página por página y guarda cada página en disco
+  normalize  une las páginas, descarta duplicados, valida contra pagination.total_events
+             y calcula los campos derivados de cada evento
+  graph      construye nodos y enlaces
+  analytics  parámetros de filtros y tablas agregadas
+  publish    publica la versión completa en Redis (y deja un snapshot)
+
+Cada etapa deja su resultado en INGEST_WORK_DIR, así que si el proceso muere
+se puede volver a ejecutar y continúa desde la última página o etapa guardada.
+El directorio se borra después de publicar.
+
+Uso:
+  python ingest.py                    # todas las etapas, retomando lo que exista
+  python ingest.py --stage graph      # solo una etapa (requiere las anteriores)
+  python ingest.py --fresh            # descartar checkpoints y empezar de cero
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import time
+
+# El pipeline no debe disparar el warm start ni el refresco en segundo plano de la app,
+# aunque el entorno del servidor tenga WARM_START=1. Tampoco el hilo de pub/sub del
+# L1 (L1_PUBSUB=1): stage_graph hace fork del pool de procesos y debe hacerlo sin
+# otros hilos vivos.
+os.environ['WARM_START'] = '0'
+os.environ['L1_PUBSUB'] = '0'
+
+import requests
+
+import app
+
+STAGES = ['fetch', 'normalize', 'graph', 'analytics', 'publish']
+DEFAULT_WORK_DIR = os.environ.get(
+    'INGEST_WORK_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ingest_work'))
+DEFAULT_PER_PAGE = 100  # máximo permitido por la API
+DEFAULT_RETRIES = 5
+RETRY_BASE_DELAY = 2  # segundos; se duplica en cada intento
+
+
+class IngestError(Exception):
+    """Falla que deja los checkpoints en disco para retomar después"""
+
+
+# ==================== CHECKPOINTS ====================
+
+def write_json(path, value, compress=False):
+    """Escritura atómica: archivo temporal + os.replace"""
+    tmp_path = path + '.tmp'
+    payload = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if compress:
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(payload)
+    else:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        return json.loads(f.read().decode('utf-8'))
+
+
+class Checkpoint:
+    """Archivos de una ejecución: state.json, pages/page_NNNNN.json y un artefacto por etapa"""
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.pages_dir = os.path.join(work_dir, 'pages')
+        self.state_path = os.path.join(work_dir, 'state.json')
+
+    def ensure(self):
+        os.makedirs(self.pages_dir, exist_ok=True)
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        return read_json(self.state_path)
+
+    def save_state(self, state):
+        write_json(self.state_path, state)
+
+    def page_path(self, page):
+        return os.path.join(self.pages_dir, f'page_{page:05d}.json')
+
+    def has_page(self, page):
+        return os.path.exists(self.page_path(page))
+
+    def save_page(self, page, data):
+        write_json(self.page_path(page), data)
+
+    def load_page(self, page):
+        return read_json(self.page_path(page))
+
+    def artifact_path(self, stage):
+        return os.path.join(self.work_dir, f'{stage}.json.gz')
+
+    def has_artifact(self, stage):
+        return os.path.exists(self.artifact_path(stage))
+
+    def save_artifact(self, stage, value):
+        write_json(self.artifact_path(stage), value, compress=True)
+
+    def load_artifact(self, stage):
+        if not self.has_artifact(stage):
+            raise IngestError(f"Missing '{stage}' output, run that stage first")
+        return read_json(self.artifact_path(stage))
+
+    def clear(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+# ==================== FETCH ====================
+
+def fetch_page(page, per_page, retries):
+    """Una página de /events con reintentos y backoff exponencial"""
+    for attempt in range(1, retries + 1):
+        try:
+            response = app.upstream_get(f"{app.API_BASE_URL}/events",
+                                        params={'page': page, 'per_page': per_page})
+            response.raise_for_status()
+            data = response.json()
+            if not isinstance(data, dict) or not isinstance(data.get('events'), list):
+                raise ValueError('unexpected response shape')
+            return data
+        except (requests.RequestException, ValueError) as e:
+            if attempt == retries:
+                raise IngestError(f"Page {page} failed after {retries} attempts: {e}")
+            delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            print(f"⚠️ Page {page} attempt {attempt}/{retries} failed ({e}), retrying in {delay}s")
+            time.sleep(delay)
+
+
+def fetch_params(retries):
+    """Parámetros de filtros de la API; fetch_api_params() devuelve None si falla y se reintenta"""
+    for attempt in range(1, retries + 1):
+        params = app.fetch_api_params()
+        if params is not None:
+            return params
+        if attempt == retries:
+            raise IngestError(f"Filter params failed after {retries} attempts")
+        delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+        print(f"⚠️ Filter params attempt {attempt}/{retries} failed, retrying in {delay}s")
+        time.sleep(delay)
+
+
+def stage_fetch(checkpoint, per_page, retries):
+    checkpoint.ensure()
+    state = checkpoint.load_state()
+    if state.get('per_page') not in (None, per_page):
+        raise IngestError(f"Checkpoint was taken with per_page={state['per_page']}; "
+                          f"use --per-page {state['per_page']} or --fresh")
+    state['per_page'] = per_page
+
+    # Un null guardado por una versión anterior tampoco cuenta como checkpoint
+    params_path = os.path.join(checkpoint.work_dir, 'api_params.json')
+    if not os.path.exists(params_path) or read_json(params_path) is None:
+        write_json(params_path, fetch_params(retries))
+
+    page = 1
+    while True:
+        if checkpoint.has_page(page):
+            data = checkpoint.load_page(page)
+        else:
+            data = fetch_page(page, per_page, retries)
+            checkpoint.save_page(page, data)
+            print(f"📥 Page {page}: {len(data['events'])} events")
+
+        pagination = data.get('pagination') or {}
+        if page == 1 or 'total_events' not in state:
+            state['total_events'] = pagination.get('total_events')
+            state['total_pages'] = pagination.get('total_pages')
+            checkpoint.save_state(state)
+
+        total_pages = state.get('total_pages')
+        if total_pages:
+            if page >= total_pages:
+                break
+        elif not data['events'] or not pagination.get('has_next', True):
+            # Sin totales en la respuesta: seguir hasta una página vacía
+            break
+        page += 1
+
+    state['fetched_pages'] = page
+    state['fetched_at'] = int(time.time() * 1000)
+    checkpoint.save_state(state)
+    print(f"✅ Fetch complete: {page} pages")
+
+
+# ==================== NORMALIZE ====================
+
+def stage_normalize(checkpoint, allow_partial=False):
+    state = checkpoint.load_state()
+    if 'fetched_pages' not in state:
+        raise IngestError("Fetch stage has not finished")
+
+    events = []
+    seen = set()
+    duplicates = 0
+    for page in range(1, state['fetched_pages'] + 1):
+        if not checkpoint.has_page(page):
+            raise IngestError(f"Page {page} is missing from the checkpoint")
+        for event in checkpoint.load_page(page)['events']:
+            if not isinstance(event, dict):
+                continue
+            key = app.event_key(event)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            event['derived'] = app.derive_event_fields(event)
+            events.append(event)
+
+    expected = state.get('total_events')
+    print(f"🧹 Normalized {len(events)} events ({duplicates} duplicates dropped), upstream reports {expected}")
+    if expected is not None and len(events) != expected:
+        message = f"Incomplete crawl: {len(events)} events, upstream reports {expected}"
+        if not allow_partial:
+            raise IngestError(message + " (use --allow-partial to publish anyway)")
+        print(f"⚠️ {message}")
+    if not events:
+        raise IngestError("No events fetched, nothing to publish")
+
+    checkpoint.save_artifact('normalize', events)
+
+
+# ==================== GRAPH ====================
+
+def stage_graph(checkpoint, processes=None):
+    events = checkpoint.load_artifact('normalize')
+    started = time.time()
+    # Proceso de un solo hilo: aquí sí es seguro usar el pool con fork
+    nodes, links = app.build_graph(events, processes, parallel=True)
+    print(f"🕸️ Graph: {len(nodes)} nodes, {len(links)} links in {time.time() - started:.1f}s")
+    checkpoint.save_artifact('graph', {'nodes': nodes, 'links': links})
+
+
+# ==================== ANALYTICS ====================
+
+def stage_analytics(checkpoint):
+    events = checkpoint.load_artifact('normalize')
+    api_params = read_json(os.path.join(checkpoint.work_dir, 'api_params.json'))
+
+    extracted_params = app.extract_params_from_events(events)
+    params = app.merge_params(api_params, extracted_params) if api_params else extracted_params
+    tables = app.derive_dataset_fields(events)
+    print(f"📊 Params: {len(params.get('composers', []))} composers, {len(params.get('cities', []))} cities; "
+          f"tables: {', '.join(f'{k}={len(v)}' for k, v in tables.items())}")
+    checkpoint.save_artifact('analytics', {'params': params, 'tables': tables})
+
+
+# ==================== PUBLISH ====================
+
+def stage_publish(checkpoint):
+    events = checkpoint.load_artifact('normalize')
+    graph = checkpoint.load_artifact('graph')
+    analytics = checkpoint.load_artifact('analytics')
+
+    timestamp = int(time.time() * 1000)
+    result = {
+        'params': analytics['params'],
+        'events': events,
+        'nodes': graph['nodes'],
+        'links': graph['links'],
+        'tables': analytics['tables'],
+        'derived_version': app.DERIVED_FIELDS_VERSION,
+        'total_events': len(events),
+        'timestamp': timestamp,
+        'version': timestamp,
+        'cached': False
+    }
+    # publish_dataset escribe la llave de versión al final: los lectores ven
+    # la versión anterior completa o la nueva completa, nunca una mezcla
+    app.publish_dataset(result)
+    print(f"🚀 Published version {timestamp}: {len(events)} events")
+    return timestamp
+
+
+# ==================== CLI ====================
+
+def run(stages, work_dir=DEFAULT_WORK_DIR, per_page=DEFAULT_PER_PAGE, retries=DEFAULT_RETRIES,
+        allow_partial=False, processes=None, keep=False, resume=True):
+    checkpoint = Checkpoint(work_dir)
+    version = None
+    for stage in stages:
+        if resume and stage in ('normalize', 'graph', 'analytics') and checkpoint.has_artifact(stage):
+            print(f"⏭️ Stage {stage} already done, reusing {checkpoint.artifact_path(stage)}")
+            continue
+        started = time.time()
+        print(f"▶️ Stage {stage}")
+        if stage == 'fetch':
+            stage_fetch(checkpoint, per_page, retries)
+        elif stage == 'normalize':
+            stage_normalize(checkpoint, allow_partial)
+        elif stage == 'graph':
+            stage_graph(checkpoint, processes)
+        elif stage == 'analytics':
+            stage_analytics(checkpoint)
+        elif stage == 'publish':
+            version = stage_publish(checkpoint)
+        print(f"⏱️ Stage {stage} done in {time.time() - started:.1f}s")
+
+    if version is not None and not keep:
+        checkpoint.clear()
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingesta reanudable de la Base de Conciertos')
+    parser.add_argument('--stage', choices=STAGES, help='ejecutar solo esta etapa')
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help='directorio de checkpoints')
+    parser.add_argument('--per-page', type=int, default=DEFAULT_PER_PAGE)
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='intentos por página')
+    parser.add_argument('--processes', type=int, default=None, help='procesos para construir el grafo')
+    parser.add_argument('--allow-partial', action='store_true',
+                        help='publicar aunque falten eventos respecto de pagination.total_events')
+    parser.add_argument('--fresh', action='store_true', help='descartar checkpoints anteriores')
+    parser.add_argument('--keep', action='store_true', help='conservar checkpoints después de publicar')
+    args = parser.parse_args(argv)
+
+    if args.fresh:
+        Checkpoint(args.work_dir).clear()
+
+    stages = [args.stage] if args.stage else STAGES
+    try:
+        # Con --stage la etapa se vuelve a ejecutar aunque ya tenga resultado
+        run(stages, args.work_dir, args.per_page, args.retries,
+            args.allow_partial, args.processes, args.keep, resume=not args.stage)
+    except IngestError as e:
+        print(f"❌ {e}")
+        print(f"   Checkpoints kept in {args.work_dir}; run again to resume.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,74 @@
 // IndexedDB utilities for caching ALL data including filter parameters
+
+const BULK_CHUNK_SIZE = 5000;   // puts per write transaction
+const GRAPH_BATCH_SIZE = 2000;  // nodes/links per batch record
+const EVENTS_PAGE_SIZE = 1000;  // events per read page
+
+// Delta patch helpers, shared by applyDelta (in-memory arrays) and
+// applyDeltaToStores (graph batch records). Same keys as app.py event_key() / link_key()
+function unsignedHash(str) {
+    let hash = 0;
+    for (let i = 0; i < str.length; i++) {
+        hash = ((hash << 5) - hash + str.charCodeAt(i)) | 0;
+    }
+    return String(hash >>> 0);
+}
+
+const eventKey = event => String(event.id || unsignedHash(event.name || 'unknown'));
+const nodeKey = node => String(node.id);
+const linkKey = link => `${link.source}|${link.target}|${link.label}`;
+
+function countKeys(keys) {
+    const counts = new Map();
+    for (const key of keys) counts.set(key, (counts.get(key) || 0) + 1);
+    return counts;
+}
+
+// Drop the items whose key is in `removed` and replace those in `upserts`, in place.
+// Used upserts are deleted from the map; the caller appends what is left.
+// Returns true if the list changed.
+function patchById(list, removed, upserts, keyOf) {
+    let w = 0;
+    let touched = false;
+    for (let r = 0; r < list.length; r++) {
+        const key = keyOf(list[r]);
+        if (removed.has(key)) {
+            touched = true;
+            continue;
+        }
+        if (upserts.has(key)) {
+            list[w++] = upserts.get(key);
+            upserts.delete(key);
+            touched = true;
+        } else {
+            list[w++] = list[r];
+        }
+    }
+    list.length = w;
+    return touched;
+}
+
+// Links are a multiset: drop one occurrence per pending removal in `toRemove`
+// (key -> count, decremented in place). Returns true if the list changed.
+function removeLinks(list, toRemove) {
+    if (!toRemove.size) return false;
+    let w = 0;
+    for (let r = 0; r < list.length; r++) {
+        const link = list[r];
+        const key = linkKey(link);
+        const pending = toRemove.get(key);
+        if (pending) {
+            if (pending === 1) toRemove.delete(key);
+            else toRemove.set(key, pending - 1);
+            continue;
+        }
+        list[w++] = link;
+    }
+    const touched = w !== list.length;
+    list.length = w;
+    return touched;
+}
+
 class MusicEventsDB {
     constructor() {
         this.dbName = 'MusicEventsDB';
@@ -78,51 +148,36 @@ class MusicEventsDB {
         }
 
         console.log('DB: Storing complete dataset...');
+        const t0 = performance.now();
         
         try {
-            // Store events
+            // The writes below span several transactions: drop the markers that make
+            // the cache look valid first, and write them again only after the last one
+            await this.deleteMetadata(['lastUpdate', 'datasetVersion', 'derivedVersion']);
+
+            // Store events (one record per event so the table view can page through them)
             if (data.events && data.events.length > 0) {
-                const tx1 = this.db.transaction(['events'], 'readwrite');
-                const eventsStore = tx1.objectStore('events');
-                await this.clearStore(eventsStore);
-                for (const event of data.events) {
-                    if (event.id) {
-                        await this.put(eventsStore, event);
-                    }
-                }
-                await this.waitForTransaction(tx1);
+                const events = data.events.filter(event => event.id);
+                await this.bulkReplace('events', events);
                 console.log(`DB: Stored ${data.events.length} events`);
             }
 
             // Store graph data
             if (data.nodes && data.nodes.length > 0) {
-                const tx2 = this.db.transaction(['nodes'], 'readwrite');
-                const nodesStore = tx2.objectStore('nodes');
-                await this.clearStore(nodesStore);
-                for (const node of data.nodes) {
-                    if (node.id) {
-                        await this.put(nodesStore, node);
-                    }
-                }
-                await this.waitForTransaction(tx2);
+                await this.writeGraphStore('nodes', data.nodes.filter(node => node.id));
                 console.log(`DB: Stored ${data.nodes.length} nodes`);
-            }
 
-            if (data.links && data.links.length > 0) {
-                const tx3 = this.db.transaction(['links'], 'readwrite');
-                const linksStore = tx3.objectStore('links');
-                await this.clearStore(linksStore);
-                for (let i = 0; i < data.links.length; i++) {
-                    const link = data.links[i];
-                    await this.put(linksStore, { 
-                        id: `link_${i}`, 
-                        source: link.source,
-                        target: link.target,
-                        label: link.label
-                    });
+                if (data.links && data.links.length > 0) {
+                    await this.writeGraphStore('links', data.links);
+                    console.log(`DB: Stored ${data.links.length} links`);
                 }
-                await this.waitForTransaction(tx3);
-                console.log(`DB: Stored ${data.links.length} links`);
+            } else if (data.events && data.events.length > 0) {
+                // New events without a graph (the table view downloads
+                // include=params,events,tables): the cached graph belongs to an older
+                // version, so drop it and let the graph page rebuild it from the events
+                await this.bulkReplace('nodes', []);
+                await this.bulkReplace('links', []);
+                console.log('DB: Cleared outdated graph stores');
             }
 
             // Store filter parameters
@@ -133,19 +188,90 @@ class MusicEventsDB {
             // Store timestamp
             const tx4 = this.db.transaction(['metadata'], 'readwrite');
             const metadataStore = tx4.objectStore('metadata');
-            await this.put(metadataStore, { 
+            metadataStore.put({ 
                 key: 'lastUpdate', 
                 value: data.timestamp || Date.now() 
             });
+            // Aggregate tables computed by the server (participants, composers, ...)
+            if (data.tables) {
+                metadataStore.put({ key: 'tables', value: data.tables });
+            }
+            // Server dataset version, used by /api/dataset_delta
+            if (data.version) {
+                metadataStore.put({ key: 'datasetVersion', value: data.version });
+            }
+            // Rules the server used for events[].derived and tables (app.py DERIVED_FIELDS_VERSION)
+            if (data.derived_version) {
+                metadataStore.put({ key: 'derivedVersion', value: data.derived_version });
+            }
             await this.waitForTransaction(tx4);
 
-            console.log('DB: All data storage complete');
+            console.log(`DB: All data storage complete in ${(performance.now() - t0).toFixed(0)} ms`);
         } catch (error) {
             console.error('DB: Error storing data:', error);
             throw error;
         }
     }
 
+    // ==================== BULK WRITES ====================
+
+    // Replace the whole content of a store. Puts are issued without awaiting each
+    // request; every chunk is one transaction and only the transaction is awaited.
+    // Not atomic: callers must invalidate lastUpdate/datasetVersion before and
+    // write them after (see storeAllData), so a crash mid-way reads as no cache.
+    async bulkReplace(storeName, records, chunkSize = BULK_CHUNK_SIZE) {
+        let transaction = this.db.transaction([storeName], 'readwrite');
+        transaction.objectStore(storeName).clear();
+
+        if (records.length === 0) {
+            await this.waitForTransaction(transaction);
+            return;
+        }
+
+        for (let start = 0; start < records.length; start += chunkSize) {
+            if (start > 0) {
+                transaction = this.db.transaction([storeName], 'readwrite');
+            }
+            const store = transaction.objectStore(storeName);
+            const end = Math.min(start + chunkSize, records.length);
+            for (let i = start; i < end; i++) {
+                store.put(records[i]);
+            }
+            await this.waitForTransaction(transaction);
+        }
+    }
+
+    // Nodes and links are only ever read as a whole, so they are stored grouped
+    // into batch records ({ id: 'batch_00000', items: [...] }) instead of one
+    // record per item.
+    async writeGraphStore(storeName, items) {
+        const batches = [];
+        for (let start = 0, n = 0; start < items.length; start += GRAPH_BATCH_SIZE, n++) {
+            const slice = items.slice(start, start + GRAPH_BATCH_SIZE);
+            batches.push({
+                id: 'batch_' + String(n).padStart(5, '0'),
+                items: storeName === 'links'
+                    ? slice.map(link => ({ source: link.source, target: link.target, label: link.label }))
+                    : slice
+            });
+        }
+        await this.bulkReplace(storeName, batches, 50);
+    }
+
+    async readGraphStore(store) {
+        const records = await this.getAll(store);
+        const items = [];
+        for (const record of records) {
+            if (Array.isArray(record.items)) {
+                for (const item of record.items) items.push(item);
+            } else {
+                // Registros sueltos de versiones anteriores del caché
+                items.push(record);
+            }
+        }
+        return items;
+    }
+
     waitForTransaction(transaction) {
         return new Promise((resolve, reject) => {
             transaction.oncomplete = () => resolve();
@@ -176,11 +302,11 @@ class MusicEventsDB {
             for (const storeName of filterStores) {
                 if (params[storeName] && Array.isArray(params[storeName])) {
                     const store = transaction.objectStore(storeName);
-                    await this.clearStore(store);
+                    store.clear();
                     
                     for (const item of params[storeName]) {
                         if (item && item.name) {
-                            await this.put(store, {
+                            store.put({
                                 id: item.id || this.generateId(item.name),
                                 name: item.name,
                                 // Store any additional metadata
@@ -195,10 +321,7 @@ class MusicEventsDB {
 
             // Only handle transaction completion if we created it
             if (shouldCreateTransaction) {
-                return new Promise((resolve, reject) => {
-                    transaction.oncomplete = resolve;
-                    transaction.onerror = () => reject(transaction.error);
-                });
+                return this.waitForTransaction(transaction);
             }
         } catch (error) {
             console.error('DB: Error in storeFilterParams:', error);
@@ -218,13 +341,13 @@ class MusicEventsDB {
                 'ensembles', 'premiere_types', 'activities', 'genders'
             ];
 
+            // One transaction, all getAll requests in flight at once
+            const transaction = this.db.transaction(filterStores, 'readonly');
+            const results = await Promise.all(
+                filterStores.map(storeName => this.getAll(transaction.objectStore(storeName)))
+            );
             const params = {};
-            
-            for (const storeName of filterStores) {
-                const transaction = this.db.transaction([storeName], 'readonly');
-                const store = transaction.objectStore(storeName);
-                params[storeName] = await this.getAll(store);
-            }
+            filterStores.forEach((storeName, i) => { params[storeName] = results[i]; });
 
             console.log('DB: Retrieved all filter parameters:', 
                 Object.keys(params).map(k => `${k}: ${params[k].length}`).join(', '));
@@ -276,34 +399,48 @@ class MusicEventsDB {
         return this.getAll(store);
     }
 
+    // Page of events ordered by id, starting after `afterKey` (null = from the start)
+    async getEventsPage(afterKey = null, limit = EVENTS_PAGE_SIZE) {
+        if (!this.db) return [];
+        const transaction = this.db.transaction(['events'], 'readonly');
+        const store = transaction.objectStore('events');
+        const range = afterKey === null ? null : IDBKeyRange.lowerBound(afterKey, true);
+        return new Promise((resolve, reject) => {
+            const request = store.getAll(range, limit);
+            request.onsuccess = () => resolve(request.result || []);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    // Read events page by page (one short transaction each) so the UI can render
+    // between pages. Returns the number of events read.
+    async iterateEvents(onPage, afterKey = null, pageSize = EVENTS_PAGE_SIZE) {
+        let total = 0;
+        while (true) {
+            const page = await this.getEventsPage(afterKey, pageSize);
+            if (page.length === 0) break;
+            onPage(page);
+            total += page.length;
+            if (page.length < pageSize) break;
+            afterKey = page[page.length - 1].id;
+        }
+        return total;
+    }
+
     async storeGraphData(nodes, links) {
         if (!this.db) {
             throw new Error('Database not initialized');
         }
 
-        const tx1 = this.db.transaction(['nodes'], 'readwrite');
-        const nodesStore = tx1.objectStore('nodes');
-        await this.clearStore(nodesStore);
-        for (const node of nodes) {
-            if (node.id) {
-                await this.put(nodesStore, node);
-            }
-        }
-        await this.waitForTransaction(tx1);
-
-        const tx2 = this.db.transaction(['links'], 'readwrite');
-        const linksStore = tx2.objectStore('links');
-        await this.clearStore(linksStore);
-        for (let i = 0; i < links.length; i++) {
-            const link = links[i];
-            await this.put(linksStore, { 
-                id: `link_${i}`,
-                source: link.source,
-                target: link.target,
-                label: link.label
-            });
+        const lastUpdate = await this.getLastUpdate();
+        await this.deleteMetadata(['lastUpdate']);
+        await this.writeGraphStore('nodes', nodes.filter(node => node.id));
+        await this.writeGraphStore('links', links);
+        if (lastUpdate) {
+            const transaction = this.db.transaction(['metadata'], 'readwrite');
+            transaction.objectStore('metadata').put({ key: 'lastUpdate', value: lastUpdate });
+            await this.waitForTransaction(transaction);
         }
-        await this.waitForTransaction(tx2);
     }
 
     async getGraphData() {
@@ -313,11 +450,10 @@ class MusicEventsDB {
 
         try {
             const transaction = this.db.transaction(['nodes', 'links'], 'readonly');
-            const nodesStore = transaction.objectStore('nodes');
-            const linksStore = transaction.objectStore('links');
-
-            const nodes = await this.getAll(nodesStore);
-            const rawLinks = await this.getAll(linksStore);
+            const [nodes, rawLinks] = await Promise.all([
+                this.readGraphStore(transaction.objectStore('nodes')),
+                this.readGraphStore(transaction.objectStore('links'))
+            ]);
 
             const links = rawLinks.map(link => ({
                 source: link.source,
@@ -345,6 +481,218 @@ class MusicEventsDB {
         }
     }
 
+    async getDerivedVersion() {
+        if (!this.db) return null;
+        try {
+            const transaction = this.db.transaction(['metadata'], 'readonly');
+            const store = transaction.objectStore('metadata');
+            const result = await this.get(store, 'derivedVersion');
+            return result ? result.value : null;
+        } catch {
+            return null;
+        }
+    }
+
+    async deleteMetadata(keys) {
+        const transaction = this.db.transaction(['metadata'], 'readwrite');
+        const store = transaction.objectStore('metadata');
+        for (const key of keys) store.delete(key);
+        await this.waitForTransaction(transaction);
+    }
+
+    async getTables() {
+        if (!this.db) return null;
+        try {
+            const transaction = this.db.transaction(['metadata'], 'readonly');
+            const store = transaction.objectStore('metadata');
+            const result = await this.get(store, 'tables');
+            return result ? result.value : null;
+        } catch {
+            return null;
+        }
+    }
+
+    async getDatasetVersion() {
+        if (!this.db) return null;
+        try {
+            const transaction = this.db.transaction(['metadata'], 'readonly');
+            const store = transaction.objectStore('metadata');
+            const result = await this.get(store, 'datasetVersion');
+            return result ? result.value : null;
+        } catch {
+            return null;
+        }
+    }
+
+    // Apply a /api/dataset_delta response in place to { events, nodes, links, params, tables }
+    applyDelta(target, delta) {
+        const patchList = (list, section, keyOf) => {
+            if (!list || !section) return;
+            const upserts = new Map(section.upserted.map(item => [keyOf(item), item]));
+            patchById(list, new Set(section.removed.map(String)), upserts, keyOf);
+            for (const item of upserts.values()) list.push(item);
+        };
+        patchList(target.events, delta.events, eventKey);
+        patchList(target.nodes, delta.nodes, nodeKey);
+
+        if (target.links && delta.links) {
+            removeLinks(target.links, countKeys(delta.links.removed));
+            for (const link of delta.links.added) target.links.push(link);
+        }
+
+        if (delta.params) target.params = delta.params;
+        if (delta.tables) target.tables = delta.tables;
+        target.version = delta.version;
+        target.timestamp = delta.timestamp;
+        if (delta.derived_version) target.derived_version = delta.derived_version;
+        return target;
+    }
+
+    // Persist a /api/dataset_delta response with targeted writes in a single
+    // transaction: events are put/deleted one by one and only the graph batch
+    // records holding a changed node or link are rewritten. Resolves with the
+    // number of records written per store.
+    applyDeltaToStores(delta) {
+        if (!this.db) {
+            return Promise.reject(new Error('Database not initialized'));
+        }
+
+        const filterStores = [
+            'composers', 'participants', 'cities', 'locations',
+            'instruments', 'event_types', 'cycles', 'organizations',
+            'ensembles', 'premiere_types', 'activities', 'genders'
+        ];
+        const storeNames = ['events', 'nodes', 'links', 'metadata'];
+        const transaction = this.db.transaction(
+            delta.params ? storeNames.concat(filterStores) : storeNames, 'readwrite');
+        const written = { events: 0, nodes: 0, links: 0 };
+
+        const events = transaction.objectStore('events');
+        for (const key of delta.events.removed) {
+            // event_key() is a string; the stored key keeps the API's type
+            events.delete(key);
+            if (/^\d+$/.test(key)) events.delete(Number(key));
+            written.events++;
+        }
+        for (const event of delta.events.upserted) {
+            if (!event.id) continue;
+            events.put(event);
+            written.events++;
+        }
+
+        // Rewrite the batches whose items changed; new items go to the last batch
+        const patchBatches = (storeName, batches, patchItems, getAdded) => {
+            const store = transaction.objectStore(storeName);
+            if (batches.some(batch => !Array.isArray(batch.items))) {
+                throw new Error(`${storeName} has records from an old cache format`);
+            }
+            batches.sort((a, b) => (a.id < b.id ? -1 : 1));
+            const changed = new Set();
+            for (const batch of batches) {
+                if (patchItems(batch.items)) changed.add(batch);
+            }
+            let last = batches[batches.length - 1];
+            for (const item of getAdded()) {
+                if (!last || last.items.length >= GRAPH_BATCH_SIZE) {
+                    const n = last ? parseInt(last.id.slice(6), 10) + 1 : 0;
+                    last = { id: 'batch_' + String(n).padStart(5, '0'), items: [] };
+                    batches.push(last);
+                }
+                last.items.push(item);
+                changed.add(last);
+            }
+            for (const batch of changed) {
+                if (batch.items.length) store.put(batch);
+                else store.delete(batch.id);
+            }
+            written[storeName] = changed.size;
+        };
+
+        // The upsert map and removal counts are shared by every batch of the store,
+        // so what is left after the last batch is what must be appended
+        const patchNodes = (batches) => {
+            const removed = new Set(delta.nodes.removed.map(String));
+            const upserts = new Map(delta.nodes.upserted.map(node => [nodeKey(node), node]));
+            patchBatches('nodes', batches, items => patchById(items, removed, upserts, nodeKey),
+                () => Array.from(upserts.values()).filter(node => node.id));
+        };
+
+        const patchLinks = (batches) => {
+            const toRemove = countKeys(delta.links.removed);
+            patchBatches('links', batches, items => removeLinks(items, toRemove),
+                () => delta.links.added.map(link => ({ source: link.source, target: link.target, label: link.label })));
+        };
+
+        return new Promise((resolve, reject) => {
+            transaction.oncomplete = () => resolve(written);
+            transaction.onerror = () => reject(transaction.error);
+            transaction.onabort = () => reject(transaction.error || new Error('Transaction aborted'));
+
+            // Callbacks instead of await: the transaction must stay active between
+            // reading the batches and writing them back. Requests complete in order.
+            const nodesRequest = transaction.objectStore('nodes').getAll();
+            const linksRequest = transaction.objectStore('links').getAll();
+            linksRequest.onsuccess = () => {
+                try {
+                    // Empty graph stores mean there is no cached graph for this version
+                    // (see storeAllData): patching them would leave a partial graph
+                    if ((nodesRequest.result || []).length > 0) {
+                        patchNodes(nodesRequest.result);
+                        patchLinks(linksRequest.result || []);
+                    }
+
+                    if (delta.params) this.storeFilterParams(delta.params, transaction);
+                    const metadata = transaction.objectStore('metadata');
+                    metadata.put({ key: 'lastUpdate', value: delta.timestamp || Date.now() });
+                    if (delta.tables) metadata.put({ key: 'tables', value: delta.tables });
+                    metadata.put({ key: 'datasetVersion', value: delta.version });
+                    if (delta.derived_version) metadata.put({ key: 'derivedVersion', value: delta.derived_version });
+                } catch (error) {
+                    transaction.abort();
+                    reject(error);
+                }
+            };
+        });
+    }
+
+    // Fetch /api/dataset_delta since the cached version, patch `target` in memory
+    // (applyDelta) and persist the same changes (applyDeltaToStores). Resolves with
+    // the delta, { up_to_date: true } when nothing changed, or null when the page
+    // has to fall back to a full download.
+    async syncDelta(target) {
+        if (!this.db) return null;
+        const version = await this.getDatasetVersion();
+        if (!version) return null;
+
+        const t0 = performance.now();
+        try {
+            const response = await fetch('/api/dataset_delta?since=' + encodeURIComponent(version));
+            if (!response.ok) return null;
+            const text = await response.text();
+            const delta = JSON.parse(text);
+
+            if (delta.up_to_date) {
+                console.log(`DB: Cache up to date (version ${version})`);
+                return delta;
+            }
+            if (delta.full_resync) {
+                console.log('DB: Delta not available:', delta.reason);
+                return null;
+            }
+
+            this.applyDelta(target, delta);
+            const t1 = performance.now();
+            const written = await this.applyDeltaToStores(delta);
+            console.log(`DB: Delta applied: ${(text.length / 1024).toFixed(1)} KB, ` +
+                `${written.events} events and ${written.nodes + written.links} graph batches written ` +
+                `in ${(performance.now() - t1).toFixed(0)} ms; total ${(performance.now() - t0).toFixed(0)} ms`);
+            return delta;
+        } catch (error) {
+            console.warn('DB: Delta sync failed:', error);
+            return null;
+        }
+    }
+
     async isDataStale(maxAgeDays = 30) {
         const lastUpdate = await this.getLastUpdate();
         if (!lastUpdate) return true;
@@ -390,12 +738,16 @@ class MusicEventsDB {
                 'ensembles', 'premiere_types', 'activities', 'genders'
             ];
             
-            for (const storeName of allStores) {
-                const transaction = this.db.transaction([storeName], 'readonly');
+            // count() instead of loading every record; graph stores hold batches,
+            // so their item counts come from the batch records themselves
+            const transaction = this.db.transaction(allStores, 'readonly');
+            const counts = await Promise.all(allStores.map(storeName => {
                 const store = transaction.objectStore(storeName);
-                const items = await this.getAll(store);
-                stats[storeName] = items.length;
-            }
+                return ['nodes', 'links'].includes(storeName)
+                    ? this.readGraphStore(store).then(items => items.length)
+                    : this.count(store);
+            }));
+            allStores.forEach((storeName, i) => { stats[storeName] = counts[i]; });
             
             const lastUpdate = await this.getLastUpdate();
             stats.lastUpdate = lastUpdate;
@@ -475,6 +827,14 @@ class MusicEventsDB {
         });
     }
 
+    count(store) {
+        return new Promise((resolve, reject) => {
+            const request = store.count();
+            request.onsuccess = () => resolve(request.result || 0);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
     getAll(store) {
         return new Promise((resolve, reject) => {
             const request = store.getAll();
@@ -11,6 +11,11 @@
     let graphData = { nodes: [], links: [] };
     let filterParams = null; // Store all filter parameters
     let worker = null;
+    let workerGraphRef = null;  // graphData que el worker tiene indexado
+    let workerEventsRef = null; // allEvents que el worker tiene almacenado
+    let graphVersion = 0;
+    let filterRequestId = 0;
+    const pendingFilterRequests = new Map(); // requestId -> performance.now() al enviar
     let db = null;
     let initialized = false;
 
@@ -238,6 +243,9 @@
         // Load filter parameters
         await loadFilterParameters();
 
+        // Traer solo los cambios del servidor desde la versión en caché (en segundo plano)
+        syncWithDelta();
+
         // Marcar que la app está lista
         appReady = true;
         console.log('Application initialized', {
@@ -400,7 +408,7 @@
         });
 
         if (isStale) {
-            const btnHtml = '<button onclick="window.handleMonthlyClickGlobal()" style="background: #ff9800; border: none; padding: 5px 10px; margin-left: 10px; border-radius: 3px; cursor: pointer; color: white;">Actualizar Ahora</button>';
+            const btnHtml = '<button onclick="window.handleStaleRefreshGlobal()" style="background: #ff9800; border: none; padding: 5px 10px; margin-left: 10px; border-radius: 3px; cursor: pointer; color: white;">Actualizar Ahora</button>';
             statusEl.innerHTML = 'Datos en caché de hace ' + ageText + ' (' + date + '). ' + btnHtml;
             statusEl.style.color = '#ff9800';
         } else {
@@ -838,6 +846,43 @@
     // Make handleMonthlyClick available globally for cache status button
     window.handleMonthlyClickGlobal = handleMonthlyClick;
 
+    // ==================== DELTA SYNC ====================
+
+    // Aplica en el lugar los cambios desde la versión en caché (db.syncDelta) y
+    // redibuja. Devuelve true si los datos quedaron al día.
+    async function syncWithDelta() {
+        if (!db || !db.db) return false;
+        if (!allEvents.length || !graphData.nodes || !graphData.nodes.length) return false;
+
+        const target = { events: allEvents, nodes: graphData.nodes, links: graphData.links };
+        const delta = await db.syncDelta(target);
+        if (!delta) return false;
+        if (delta.up_to_date) return true;
+
+        // Objetos nuevos para que el worker vuelva a indexar
+        allEvents = target.events.slice();
+        graphData = { nodes: target.nodes, links: target.links };
+        updateEventsMap();
+
+        if (delta.params) {
+            filterParams = delta.params;
+            populateFilterDropdowns();
+        }
+        updateCacheStatus(delta.timestamp, false);
+        if (sigma) renderGraph(graphData.nodes, graphData.links);
+        return true;
+    }
+
+    async function handleStaleRefresh() {
+        if (await syncWithDelta()) {
+            showNotification('Datos actualizados con los últimos cambios', 3000);
+            return;
+        }
+        handleMonthlyClick();
+    }
+
+    window.handleStaleRefreshGlobal = handleStaleRefresh;
+
     function handleClearClick() {
         if (elements.yearFrom) elements.yearFrom.value = '';
         if (elements.yearTo) elements.yearTo.value = '';
@@ -906,7 +951,25 @@
             return;
         }
         showLoading(true, 'Procesando eventos...');
-        worker.postMessage({ events, filters });
+        // Los eventos se envían al worker una sola vez; después solo viajan los filtros
+        if (events !== workerEventsRef) {
+            worker.postMessage({ type: 'loadEvents', events });
+            workerEventsRef = events;
+        }
+        worker.postMessage({ type: 'processEvents', filters });
+    }
+
+    // Envía nodes/links al worker solo cuando graphData cambió desde el último envío
+    function syncWorkerGraph() {
+        if (workerGraphRef === graphData) return;
+        graphVersion++;
+        worker.postMessage({
+            type: 'loadGraph',
+            graphVersion,
+            nodes: graphData.nodes,
+            links: graphData.links
+        });
+        workerGraphRef = graphData;
     }
 
     function filterGraphData(filters) {
@@ -917,7 +980,8 @@
 
         filters = filters || {};
 
-        const hasFilters = filters.year || filters.composer_q || filters.participant_q ||
+        const hasFilters = filters.year || filters.yearFrom || filters.yearTo || filters.global_q ||
+            filters.composer_q || filters.participant_q ||
             filters.piece_q || filters.name_q || filters.location_q ||
             filters.activity_q || filters.gender_q;
 
@@ -927,18 +991,62 @@
         }
 
         showLoading(true, 'Filtrando datos...');
-        worker.postMessage({ nodes: graphData.nodes, links: graphData.links, filters });
+        syncWorkerGraph();
+        const requestId = ++filterRequestId;
+        pendingFilterRequests.set(requestId, performance.now());
+        worker.postMessage({ type: 'filterGraph', graphVersion, requestId, filters });
+    }
+
+    // Convierte los índices (Int32Array transferidos) de vuelta a nodos/enlaces
+    function handleFilterResult(data) {
+        const sentAt = pendingFilterRequests.get(data.requestId);
+        pendingFilterRequests.delete(data.requestId);
+
+        if (data.graphVersion !== graphVersion || data.requestId !== filterRequestId) {
+            console.log('Discarding stale filter result', data.requestId);
+            return;
+        }
+
+        if (sentAt !== undefined) {
+            console.log(`⏱️ Filter round-trip: ${(performance.now() - sentAt).toFixed(1)} ms`);
+        }
+
+        if (data.all) {
+            renderGraph(graphData.nodes, graphData.links);
+            return;
+        }
+
+        const nodes = Array.from(data.nodeIndices, i => graphData.nodes[i]);
+        const links = Array.from(data.linkIndices, i => graphData.links[i]);
+
+        if (nodes.length > 0) {
+            renderGraph(nodes, links);
+        } else {
+            showMessage('No se encontraron resultados con esos filtros.');
+        }
     }
 
     async function handleWorkerMessage(e) {
-        const { nodes, links, error } = e.data;
+        const data = e.data || {};
+
+        if (data.type === 'error') {
+            console.error('Worker error:', data.error);
+            showMessage('Error procesando datos: ' + data.error);
+            return;
+        }
 
-        if (error) {
-            console.error('Worker error:', error);
-            showMessage('Error procesando datos: ' + error);
+        if (data.type === 'graphLoaded') {
+            console.log('Worker graph index ready (version ' + data.graphVersion + ')');
             return;
         }
 
+        if (data.type === 'filterResult') {
+            handleFilterResult(data);
+            return;
+        }
+
+        const { nodes, links } = data;
+
         if (nodes && nodes.length > 0) {
             if (!graphData.nodes || graphData.nodes.length === 0) {
                 graphData = { nodes, links: links || [] };
@@ -15,6 +15,7 @@ let state = {
         locations: []
     },
     filteredData: [],
+    datasetVersion: null, // versión del dataset en pantalla (para exportar la misma)
     filters: {
         categories: [],
         search: '',
@@ -36,6 +37,9 @@ let state = {
 // Instancia de base de datos
 let db = null;
 
+// Eventos leídos del caché antes de mostrar la tabla por primera vez
+const FIRST_CACHE_PAGE_SIZE = 500;
+
 // Configuración de columnas por tipo de datos
 const tableConfigs = {
     events: [
@@ -197,24 +201,34 @@ async function loadData() {
         // INTENTO 1: Cargar desde caché si está disponible
         if (db && db.db) {
             console.log('Intentando cargar desde caché...');
-            const cachedEvents = await db.getAllEvents();
-            const cachedParams = await db.getAllFilterParams();
+            // Solo la primera página de eventos: la tabla se muestra de inmediato
+            // y el resto se lee por páginas en segundo plano
+            const cachedEvents = await db.getEventsPage(null, FIRST_CACHE_PAGE_SIZE);
 
             if (cachedEvents && cachedEvents.length > 0) {
-                console.log(`✅ Datos cargados desde caché: ${cachedEvents.length} eventos`);
+                console.log(`✅ Primera página cargada desde caché: ${cachedEvents.length} eventos`);
                 data = {
                     events: cachedEvents,
-                    params: cachedParams
+                    params: await db.getAllFilterParams(),
+                    tables: await db.getTables(),
+                    derived_version: await db.getDerivedVersion()
                 };
                 fromCache = true;
 
                 // Verificar si los datos están obsoletos
                 const isStale = await db.isDataStale(30); // 30 días
+
+                // Completar el caché y luego pedir al servidor solo los cambios
+                setTimeout(async () => {
+                    const fullData = cachedEvents.length === FIRST_CACHE_PAGE_SIZE
+                        ? await loadRemainingCachedEvents(data)
+                        : data;
+                    if (fullData) await refreshCachedData(fullData, isStale);
+                }, 0);
+
                 if (isStale) {
                     console.log('⚠️ Los datos en caché están obsoletos (>30 días)');
                     showToast('Los datos pueden estar desactualizados. Refrescando...', 'warning');
-                    // Recargar en segundo plano
-                    loadDataFromAPI(true);
                 } else {
                     const lastUpdate = await db.getLastUpdate();
                     const daysAgo = Math.floor((Date.now() - lastUpdate) / (1000 * 60 * 60 * 24));
@@ -250,6 +264,47 @@ async function loadData() {
     }
 }
 
+// Completar los eventos en caché después de la primera página
+async function loadRemainingCachedEvents(firstData) {
+    const t0 = performance.now();
+    const events = firstData.events.slice();
+    try {
+        await db.iterateEvents(page => {
+            for (const event of page) events.push(event);
+        }, events[events.length - 1].id);
+    } catch (error) {
+        console.warn('⚠️ No se pudo leer el resto del caché:', error);
+        return null;
+    }
+    console.log(`✅ ${events.length} eventos leídos del caché en ${(performance.now() - t0).toFixed(0)} ms`);
+    const fullData = { ...firstData, events };
+    processData(fullData);
+    return fullData;
+}
+
+// Actualizar el caché local: primero con delta sync, si no se puede y está obsoleto, descarga completa
+async function refreshCachedData(cachedData, isStale) {
+    const applied = await syncWithDelta(cachedData);
+    if (!applied && isStale) {
+        // Recargar en segundo plano
+        loadDataFromAPI(true);
+    }
+}
+
+// Aplica en el lugar los cambios desde la versión en caché (db.syncDelta) y vuelve a
+// procesar la tabla. La tabla no usa el grafo: en memoria solo cambian eventos, params
+// y tablas. Devuelve true si el caché quedó al día.
+async function syncWithDelta(cachedData) {
+    if (!db || !db.db) return false;
+    const delta = await db.syncDelta(cachedData);
+    if (!delta) return false;
+    if (!delta.up_to_date) {
+        processData(cachedData);
+        showToast('Datos actualizados con los últimos cambios', 'success');
+    }
+    return true;
+}
+
 // Cargar datos desde la API
 async function loadDataFromAPI(silent = false) {
     if (!silent) {
@@ -257,7 +312,8 @@ async function loadDataFromAPI(silent = false) {
     }
 
     try {
-        const response = await fetch('/api/monthly_ingestion');
+        // La tabla no usa el grafo: pedir solo params, eventos y tablas agregadas
+        const response = await fetch('/api/monthly_ingestion?include=params,events,tables');
         if (!response.ok) {
             throw new Error(`HTTP ${response.status}`);
         }
@@ -277,6 +333,9 @@ async function loadDataFromAPI(silent = false) {
                     nodes: data.nodes || [],
                     links: data.links || [],
                     params: data.params || {},
+                    tables: data.tables || null,
+                    version: data.version,
+                    derived_version: data.derived_version,
                     timestamp: Date.now()
                 });
                 console.log('✅ Datos guardados en caché exitosamente');
@@ -307,6 +366,14 @@ async function loadDataFromAPI(silent = false) {
 // Procesar datos recibidos
 function processData(data) {
     console.log('Procesando datos...');
+    if (data.version) state.datasetVersion = data.version;
+
+    // El servidor ya calcula los campos derivados y las tablas agregadas durante la ingesta
+    if (hasServerDerivedData(data)) {
+        applyServerDerivedData(data);
+        applyFilters();
+        return;
+    }
 
     // Función auxiliar para limpiar nombres duplicados (ej: "Nombre - Nombre" -> "Nombre")
     function cleanDuplicateName(name) {
@@ -355,6 +422,7 @@ function processData(data) {
             participants_count: (event.participants || []).length,
             genders: Array.from(genders).join(', ') || 'N/A',
             date: formatDate(event.date) || 'N/A',
+            date_raw: event.date,
             year: yearVal || 'N/A',
             cycle: event.cycle || 'Ninguno',
             event_type: event.event_type || 'N/A',
@@ -485,6 +553,41 @@ function processData(data) {
     applyFilters();
 }
 
+// Versión de las reglas de campos derivados que entiende esta página (app.py DERIVED_FIELDS_VERSION)
+const DERIVED_FIELDS_VERSION = 2;
+
+// ¿El dataset trae campos derivados calculados en el servidor (app.py derive_dataset_fields)
+// con las reglas actuales? Si son de otra versión se recalculan aquí.
+function hasServerDerivedData(data) {
+    const events = data.events || [];
+    if (data.derived_version !== DERIVED_FIELDS_VERSION) return false;
+    return !!(data.tables && events.length > 0 && events.every(e => e.derived));
+}
+
+function applyServerDerivedData(data) {
+    state.allData.events = data.events.map(event => {
+        const d = event.derived;
+        return {
+            ...event,
+            participants_count: d.participants_count,
+            genders: d.genders,
+            date: d.date_display,
+            date_raw: event.date,
+            year: d.year || 'N/A',
+            cycle: event.cycle || 'Ninguno',
+            event_type: event.event_type || 'N/A',
+            venue: d.venue,
+            city: d.city,
+            program_summary: d.program_summary
+        };
+    });
+    state.allData.participants = data.tables.participants || [];
+    state.allData.composers = data.tables.composers || [];
+    state.allData.cities = data.tables.cities || [];
+    state.allData.locations = data.tables.locations || [];
+    console.log(`✅ Usando campos derivados del servidor: ${state.allData.events.length} eventos`);
+}
+
 // Alternar Filtros Avanzados
 function toggleAdvancedFilters() {
     const content = document.getElementById('advanced-filters-content');
@@ -1083,22 +1186,79 @@ function clearAllFilters() {
     applyFilters();
 }
 
-function exportData() {
-    const csv = convertToCSV(state.filteredData);
-    downloadCSV(csv, `${state.currentTab}_export_${new Date().toISOString().slice(0, 10)}.csv`);
+// Columnas de cada exportación: las mismas que app.py (EVENT_EXPORT_COLUMNS y
+// TABLE_EXPORT_COLUMNS), así el CSV filtrado y el del servidor son intercambiables
+const EXPORT_COLUMNS = {
+    events: ['id', 'name', 'date', 'year', 'event_type', 'cycle', 'location', 'venue', 'city',
+        'participants_count', 'participants', 'composers', 'program_summary'],
+    participants: ['name', 'activity', 'gender', 'events_count'],
+    composers: ['name', 'pieces_count', 'events_count'],
+    cities: ['name', 'events_count'],
+    locations: ['name', 'city', 'events_count']
+};
+
+// Tablas que el servidor exporta completas en streaming (/api/export/<tabla>.csv)
+const SERVER_EXPORT_TABS = Object.keys(EXPORT_COLUMNS);
+
+async function exportData() {
+    const tab = state.currentTab;
+    const fullTable = state.allData[tab] || [];
+    const filename = `${tab}_export_${new Date().toISOString().slice(0, 10)}.csv`;
+
+    // Sin filtros activos, el servidor arma el CSV por partes sin pasar por el navegador,
+    // siempre que tenga la misma versión del dataset que se está mostrando
+    if (SERVER_EXPORT_TABS.includes(tab) && state.filteredData.length === fullTable.length) {
+        const version = state.datasetVersion || (db && db.db ? await db.getDatasetVersion() : null);
+        const url = `/api/export/${tab}.csv` + (version ? `?version=${encodeURIComponent(version)}` : '');
+        try {
+            const check = await fetch(url, { method: 'HEAD' });
+            if (check.ok) {
+                window.location.href = url;
+                return;
+            }
+            if (check.status === 409) {
+                showToast('El servidor tiene una versión más nueva de los datos; se exportan los datos en pantalla', 'warning');
+            }
+        } catch (error) {
+            console.warn('⚠️ Exportación del servidor no disponible:', error);
+        }
+    }
+
+    downloadCSV(convertToCSV(tab, state.filteredData), filename);
+}
+
+// Fila de exportación con los mismos valores que app.py event_export_rows()/export_rows()
+function exportRow(tab, item) {
+    if (tab !== 'events') return item;
+    const composers = [];
+    (item.program || []).forEach(piece => {
+        (piece.composers || []).forEach(composer => {
+            if (composer && composer !== 'Desconocido' && !composers.includes(composer)) {
+                composers.push(composer);
+            }
+        });
+    });
+    return {
+        ...item,
+        date: item.date_raw,
+        year: item.year === 'N/A' ? '' : item.year,
+        event_type: item.event_type === 'N/A' ? '' : item.event_type,
+        cycle: item.cycle === 'Ninguno' ? '' : item.cycle,
+        participants: (item.participants || []).map(p => p.name || '').join('; '),
+        composers: composers.join('; ')
+    };
 }
 
-function convertToCSV(data) {
-    if (!data.length) return '';
-
-    const headers = Object.keys(data[0]).filter(h => h !== 'raw_data');
-    const rows = data.map(obj =>
-        headers.map(header => {
-            const value = obj[header];
-            if (typeof value === 'object') return JSON.stringify(value);
-            return `"${String(value || '').replace(/"/g, '""')}"`;
-        }).join(',')
-    );
+function convertToCSV(tab, data) {
+    const headers = EXPORT_COLUMNS[tab] || (data.length ? Object.keys(data[0]).filter(h => h !== 'raw_data') : []);
+    const rows = data.map(obj => {
+        const row = exportRow(tab, obj);
+        return headers.map(header => {
+            const value = row[header];
+            if (value !== null && typeof value === 'object') return JSON.stringify(value);
+            return `"${String(value ?? '').replace(/"/g, '""')}"`;
+        }).join(',');
+    });
 
     return [headers.join(','), ...rows].join('\n');
 }
@@ -1,212 +1,242 @@
 // Web Worker for processing events into graph data or filtering existing graph data
 'use strict';
 
-self.onmessage = function (e) {
-    console.log('Worker: Received message');
+// Persistent state: the graph and the events are sent once and kept here, so
+// later filter requests only carry the filter object.
+let graphIndex = null;   // CSR graph built by buildGraphIndex()
+let storedEvents = null; // Events sent with 'loadEvents'
+
+const NO_YEAR = -32768;
 
-    const { events, nodes, links, filters } = e.data;
+self.onmessage = function (e) {
+    const msg = e.data || {};
+    console.log('Worker: Received message', msg.type || '(legacy)');
 
     try {
-        if (events && Array.isArray(events)) {
-            // Process events into graph data
-            console.log('Worker: Processing', events.length, 'events into graph data');
-            const result = processEventsToGraph(events, filters || {});
-            console.log('Worker: Processed to', result.nodes.length, 'nodes and', result.links.length, 'links');
-            self.postMessage({ nodes: result.nodes, links: result.links });
-        } else if (nodes && links) {
-            // Filter existing graph data
-            console.log('Worker: Filtering', nodes.length, 'nodes and', links.length, 'links');
-            const result = filterGraphData(nodes, links, filters || {});
-            console.log('Worker: Filtered to', result.filteredNodes.length, 'nodes and', result.filteredLinks.length, 'links');
-            self.postMessage({ nodes: result.filteredNodes, links: result.filteredLinks });
-        } else {
-            throw new Error('Invalid message format: expected events array or nodes/links arrays');
+        switch (msg.type) {
+            case 'loadGraph': {
+                const t0 = performance.now();
+                graphIndex = buildGraphIndex(msg.nodes || [], msg.links || []);
+                graphIndex.version = msg.graphVersion;
+                console.log(`Worker: Graph index built (${graphIndex.nodeCount} nodes, ${graphIndex.linkCount} links) in ${(performance.now() - t0).toFixed(1)} ms`);
+                self.postMessage({ type: 'graphLoaded', graphVersion: msg.graphVersion });
+                break;
+            }
+            case 'filterGraph': {
+                if (!graphIndex || graphIndex.version !== msg.graphVersion) {
+                    throw new Error('Graph not loaded in worker (version ' + msg.graphVersion + ')');
+                }
+                const t0 = performance.now();
+                const result = filterGraphIndex(graphIndex, msg.filters || {});
+                console.log(`Worker: Filtered to ${result.nodeIndices.length} nodes and ${result.linkIndices.length} links in ${(performance.now() - t0).toFixed(1)} ms`);
+                // Index buffers are transferred, not cloned
+                self.postMessage({
+                    type: 'filterResult',
+                    requestId: msg.requestId,
+                    graphVersion: msg.graphVersion,
+                    all: result.all,
+                    nodeIndices: result.nodeIndices,
+                    linkIndices: result.linkIndices
+                }, [result.nodeIndices.buffer, result.linkIndices.buffer]);
+                break;
+            }
+            case 'loadEvents':
+                storedEvents = msg.events || [];
+                console.log('Worker: Stored', storedEvents.length, 'events');
+                break;
+            case 'processEvents': {
+                const events = msg.events || storedEvents;
+                if (!events) throw new Error('No events loaded in worker');
+                console.log('Worker: Processing', events.length, 'events into graph data');
+                const result = processEventsToGraph(events, msg.filters || {});
+                console.log('Worker: Processed to', result.nodes.length, 'nodes and', result.links.length, 'links');
+                self.postMessage({ type: 'graph', nodes: result.nodes, links: result.links });
+                break;
+            }
+            default:
+                throw new Error('Invalid message type: ' + msg.type);
         }
     } catch (error) {
         console.error('Worker error:', error);
-        self.postMessage({ error: error.message });
+        self.postMessage({ type: 'error', error: error.message });
     }
 };
 
-function filterGraphData(nodes, links, filters) {
-    filters = filters || {};
+// ==================== GRAPH INDEX (CSR) ====================
+
+// Integer node ids, typed-array attributes and CSR adjacency (offsets + neighbors)
+function buildGraphIndex(nodes, links) {
+    const nodeCount = nodes.length;
+    const idToIndex = new Map();
+    const typeNames = [];
+    const typeCodes = new Map();
+    const types = new Uint8Array(nodeCount);
+    const years = new Int16Array(nodeCount);
+    const labels = new Array(nodeCount);
+
+    for (let i = 0; i < nodeCount; i++) {
+        const node = nodes[i];
+        if (!idToIndex.has(node.id)) idToIndex.set(node.id, i);
+
+        const type = node.type || '';
+        let code = typeCodes.get(type);
+        if (code === undefined) {
+            code = typeNames.length;
+            typeNames.push(type);
+            typeCodes.set(type, code);
+        }
+        types[i] = code;
 
-    // Check if any filter is active
-    const hasFilters = filters.yearFrom || filters.yearTo || filters.global_q ||
-        filters.composer_q || filters.participant_q || filters.location_q;
+        const year = type === 'event' ? getYear(node) : NaN;
+        years[i] = isNaN(year) ? NO_YEAR : year;
+        labels[i] = (node.label || '').toLowerCase();
+    }
 
-    if (!hasFilters) {
-        return { filteredNodes: nodes, filteredLinks: links };
+    const linkCount = links.length;
+    const sources = new Int32Array(linkCount);
+    const targets = new Int32Array(linkCount);
+    const degree = new Int32Array(nodeCount + 1);
+
+    for (let i = 0; i < linkCount; i++) {
+        const s = idToIndex.has(links[i].source) ? idToIndex.get(links[i].source) : -1;
+        const t = idToIndex.has(links[i].target) ? idToIndex.get(links[i].target) : -1;
+        sources[i] = s;
+        targets[i] = t;
+        if (s >= 0 && t >= 0) {
+            degree[s + 1]++;
+            degree[t + 1]++;
+        }
     }
 
-    console.log('Worker: Applying filters:', filters);
+    const offsets = new Int32Array(nodeCount + 1);
+    for (let i = 0; i < nodeCount; i++) offsets[i + 1] = offsets[i] + degree[i + 1];
 
-    // Debug: check if nodes have year field
-    const eventNodes = nodes.filter(n => n.type === 'event');
-    console.log('Worker: Total event nodes:', eventNodes.length);
+    const neighbors = new Int32Array(offsets[nodeCount]);
+    const cursor = offsets.slice(0, nodeCount);
+    for (let i = 0; i < linkCount; i++) {
+        const s = sources[i], t = targets[i];
+        if (s < 0 || t < 0) continue;
+        neighbors[cursor[s]++] = t;
+        neighbors[cursor[t]++] = s;
+    }
 
-    const nodesWithYear = eventNodes.filter(n => n.year !== undefined && n.year !== null);
-    console.log('Worker: Event nodes with year:', nodesWithYear.length);
+    return {
+        nodeCount, linkCount, typeNames, typeCodes,
+        types, years, labels, sources, targets, offsets, neighbors
+    };
+}
 
-    if (nodesWithYear.length > 0) {
-        const sampleYears = nodesWithYear.slice(0, 5).map(n => n.year);
-        console.log('Worker: Sample years:', sampleYears);
-    }
+// Same semantics as the former object-based filterGraphData(), on the CSR index
+function filterGraphIndex(g, filters) {
+    filters = filters || {};
 
-    // Build a map of node IDs to nodes for quick lookup
-    const nodeById = new Map();
-    nodes.forEach(n => nodeById.set(n.id, n));
+    const hasFilters = filters.yearFrom || filters.yearTo || filters.global_q ||
+        filters.composer_q || filters.participant_q || filters.location_q;
 
-    // Build adjacency list for traversal
-    const adjacency = new Map();
-    nodes.forEach(n => adjacency.set(n.id, new Set()));
-    links.forEach(l => {
-        if (adjacency.has(l.source)) adjacency.get(l.source).add(l.target);
-        if (adjacency.has(l.target)) adjacency.get(l.target).add(l.source);
-    });
+    if (!hasFilters) {
+        return { all: true, nodeIndices: new Int32Array(0), linkIndices: new Int32Array(0) };
+    }
 
-    const matchingNodeIds = new Set();
+    console.log('Worker: Applying filters:', filters);
 
-    // First pass: find nodes that match filters
-    for (const node of nodes) {
-        const label = (node.label || '').toLowerCase();
-        const nodeType = node.type || '';
+    const hasYear = !!(filters.yearFrom || filters.yearTo);
+    const from = parseInt(filters.yearFrom) || 0;
+    const to = parseInt(filters.yearTo) || 3000;
+    const globalQ = filters.global_q ? filters.global_q.toLowerCase() : '';
+    const specific = [
+        ['event', filters.name_q],
+        ['composer', filters.composer_q],
+        ['participant', filters.participant_q],
+        ['piece', filters.piece_q],
+        ['location', filters.location_q && filters.location_q.trim()],
+        ['city', filters.location_q && filters.location_q.trim()],
+        ['instrument', filters.activity_q]
+    ].filter(([type, q]) => q && g.typeCodes.has(type))
+        .map(([type, q]) => [g.typeCodes.get(type), q.toLowerCase()]);
+    const eventCode = g.typeCodes.has('event') ? g.typeCodes.get('event') : -1;
+
+    // First pass: find nodes that match filters (depth 0)
+    const depth = new Int8Array(g.nodeCount).fill(-1);
+    let frontier = [];
+
+    for (let i = 0; i < g.nodeCount; i++) {
+        const label = g.labels[i];
+        const code = g.types[i];
 
         // Year range filter - only applies to event nodes
-        if ((filters.yearFrom || filters.yearTo) && nodeType === 'event') {
-            const nodeYear = getYear(node); // ✅ USAR HELPER
-            if (!isNaN(nodeYear)) {
-                const From = parseInt(filters.yearFrom) || 0;
-                const To = parseInt(filters.yearTo) || 3000;
-                if (nodeYear >= From && nodeYear <= To) {
-                    matchingNodeIds.add(node.id);
-                    continue;
-                }
-            } else {
-                // Si el evento no tiene año detectable, NO lo mostramos si hay filtro de año activado
+        if (hasYear && code === eventCode) {
+            const year = g.years[i];
+            if (year === NO_YEAR) continue;
+            if (year >= from && year <= to) {
+                depth[i] = 0;
+                frontier.push(i);
                 continue;
             }
         }
 
         // Global search - applies to all nodes
-        if (filters.global_q) {
-            if (label.includes(filters.global_q.toLowerCase())) {
-                matchingNodeIds.add(node.id);
-                continue;
-            }
+        if (globalQ && label.includes(globalQ)) {
+            depth[i] = 0;
+            frontier.push(i);
+            continue;
         }
 
         // If no primary filters matched, check specific fields
-        if (!(filters.yearFrom || filters.yearTo || filters.global_q)) {
-            let matches = false;
-
-            // Event name filter
-            if (filters.name_q && nodeType === 'event') {
-                if (label.includes(filters.name_q.toLowerCase())) {
-                    matches = true;
+        if (!(hasYear || globalQ)) {
+            for (const [typeCode, q] of specific) {
+                if (code === typeCode && label.includes(q)) {
+                    depth[i] = 0;
+                    frontier.push(i);
+                    break;
                 }
             }
-
-            // Composer filter
-            if (filters.composer_q && nodeType === 'composer') {
-                if (label.includes(filters.composer_q.toLowerCase())) {
-                    matches = true;
-                }
-            }
-
-            // Participant filter
-            if (filters.participant_q && nodeType === 'participant') {
-                if (label.includes(filters.participant_q.toLowerCase())) {
-                    matches = true;
-                }
-            }
-
-            // Piece filter
-            if (filters.piece_q && nodeType === 'piece') {
-                if (label.includes(filters.piece_q.toLowerCase())) {
-                    matches = true;
-                }
-            }
-
-            // Location filter
-            if (filters.location_q && (nodeType === 'location' || nodeType === 'city')) {
-                const filterLoc = filters.location_q.toLowerCase().trim();
-                const nodeLabel = label.toLowerCase().trim();
-                if (nodeLabel.includes(filterLoc)) {
-                    matches = true;
-                }
-            }
-
-            // Activity/Instrument filter
-            if (filters.activity_q && nodeType === 'instrument') {
-                if (label.includes(filters.activity_q.toLowerCase())) {
-                    matches = true;
-                }
-            }
-
-
-
-            if (matches) {
-                matchingNodeIds.add(node.id);
-            }
         }
     }
 
-    console.log('Worker: Matching nodes after first pass:', matchingNodeIds.size);
+    console.log('Worker: Matching nodes after first pass:', frontier.length);
 
     // If year range filter is set but no events matched, return empty
-    if ((filters.yearFrom || filters.yearTo) && matchingNodeIds.size === 0) {
-        return { filteredNodes: [], filteredLinks: [] };
+    if (hasYear && frontier.length === 0) {
+        return { all: false, nodeIndices: new Int32Array(0), linkIndices: new Int32Array(0) };
     }
 
     // Expand for context (3 levels)
-    // L1: Direct neighbors (e.g., Event -> Participant)
-    // L2: Neighbors of neighbors (e.g., Participant -> Instrument)
-    // L3: Third level (needed if we match Composer -> Piece -> Event -> Participant)
-    const expandedIds = new Set(matchingNodeIds);
-
-    // Level 1 expansion
-    matchingNodeIds.forEach(nodeId => {
-        const neighbors = adjacency.get(nodeId);
-        if (neighbors) neighbors.forEach(n => expandedIds.add(n));
-    });
-
-    // Level 2 expansion
-    const level1 = new Set(expandedIds);
-    level1.forEach(nodeId => {
-        const neighbors = adjacency.get(nodeId);
-        if (neighbors) neighbors.forEach(n => expandedIds.add(n));
-    });
-
-    // Level 3 expansion
-    const level2 = new Set(expandedIds);
-    level2.forEach(nodeId => {
-        const neighbors = adjacency.get(nodeId);
-        if (neighbors) neighbors.forEach(n => expandedIds.add(n));
-    });
-
-    // ✅ NUEVO: Filtrado estricto final por año para eventos "resucitados" por expansión
-    if (filters.yearFrom || filters.yearTo) {
-        const from = parseInt(filters.yearFrom) || 0;
-        const to = parseInt(filters.yearTo) || 3000;
-
-        for (const id of expandedIds) {
-            const node = nodeById.get(id);
-            if (node && node.type === 'event') {
-                const nodeYear = getYear(node); // ✅ USAR HELPER
-                if (isNaN(nodeYear) || nodeYear < from || nodeYear > to) {
-                    expandedIds.delete(id);
+    for (let level = 1; level <= 3; level++) {
+        const next = [];
+        for (const i of frontier) {
+            for (let k = g.offsets[i]; k < g.offsets[i + 1]; k++) {
+                const n = g.neighbors[k];
+                if (depth[n] === -1) {
+                    depth[n] = level;
+                    next.push(n);
                 }
             }
         }
+        frontier = next;
     }
 
-    // Filter nodes and links
-    const filteredNodes = nodes.filter(n => expandedIds.has(n.id));
-    const filteredLinks = links.filter(l => expandedIds.has(l.source) && expandedIds.has(l.target));
+    // Filtrado estricto final por año para eventos "resucitados" por expansión
+    if (hasYear) {
+        for (let i = 0; i < g.nodeCount; i++) {
+            if (depth[i] !== -1 && g.types[i] === eventCode) {
+                const year = g.years[i];
+                if (year === NO_YEAR || year < from || year > to) depth[i] = -1;
+            }
+        }
+    }
+
+    let nodeTotal = 0;
+    for (let i = 0; i < g.nodeCount; i++) if (depth[i] !== -1) nodeTotal++;
+    const nodeIndices = new Int32Array(nodeTotal);
+    for (let i = 0, j = 0; i < g.nodeCount; i++) if (depth[i] !== -1) nodeIndices[j++] = i;
+
+    const kept = [];
+    for (let i = 0; i < g.linkCount; i++) {
+        const s = g.sources[i], t = g.targets[i];
+        if (s >= 0 && t >= 0 && depth[s] !== -1 && depth[t] !== -1) kept.push(i);
+    }
 
-    console.log('Worker: Filter complete -', filteredNodes.length, 'nodes,', filteredLinks.length, 'links');
-    return { filteredNodes, filteredLinks };
+    return { all: false, nodeIndices, linkIndices: Int32Array.from(kept) };
 }
 
 function processEventsToGraph(events, filters) {
@@ -0,0 +1,159 @@
+"""
+Pruebas de ingest.py contra un stub HTTP local de la API (sin red ni Redis).
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+# Caché en memoria del proceso: las pruebas no tocan un Redis real. Sin warm start,
+# que leería snapshots/ del repo y podría lanzar un refresco contra la API real
+os.environ['CACHE_TYPE'] = 'SimpleCache'
+os.environ['WARM_START'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import ingest  # noqa: E402
+
+PER_PAGE = 10
+TOTAL_EVENTS = 45  # 5 páginas, la última incompleta
+
+
+def make_event(i):
+    return {
+        'id': i,
+        'name': f'Concierto {i}',
+        'date': f'1960-01-{i % 28 + 1:02d}',
+        'location': f'Teatro {i % 3}, Santiago (Chile)',
+        'event_type': 'Concierto',
+        'participants': [{'name': f'Persona {i % 5}', 'activity': 'Intérprete - Piano', 'gender': 'Femenino'}],
+        'program': [{'piece_name': f'Obra {i}', 'composers': [f'Compositor {i % 4}']}]
+    }
+
+
+class UpstreamStub:
+    """API falsa: /events paginado y /status/get_params, con una página que puede fallar"""
+
+    def __init__(self, total_events=TOTAL_EVENTS, reported_total=None):
+        self.events = [make_event(i) for i in range(1, total_events + 1)]
+        self.reported_total = reported_total if reported_total is not None else total_events
+        self.fail_page = None
+        self.pages_requested = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path.endswith('/status/get_params'):
+                    return self.reply(200, {'composers': [{'name': 'Compositor 0'}]})
+                page = int(query.get('page', 1))
+                per_page = int(query.get('per_page', PER_PAGE))
+                stub.pages_requested.append(page)
+                if page == stub.fail_page:
+                    return self.reply(503, {'error': 'unavailable'})
+                total_pages = -(-len(stub.events) // per_page)
+                return self.reply(200, {
+                    'events': stub.events[(page - 1) * per_page:page * per_page],
+                    'pagination': {'total_events': stub.reported_total, 'total_pages': total_pages,
+                                   'current_page': page, 'has_next': page < total_pages}
+                })
+
+            def reply(self, status, body):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/api'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_stub(monkeypatch, tmp_path, **kwargs):
+    stub = UpstreamStub(**kwargs)
+    monkeypatch.setattr(app, 'API_BASE_URL', stub.base_url)
+    monkeypatch.setattr(app, 'PARAMS_URL', f'{stub.base_url}/status/get_params')
+    monkeypatch.setattr(app, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(ingest, 'RETRY_BASE_DELAY', 0)
+    app.cache.clear()
+    return stub
+
+
+def run_cli(work_dir, *args):
+    return ingest.main(['--work-dir', str(work_dir), '--per-page', str(PER_PAGE), '--retries', '2', *args])
+
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    stub = start_stub(monkeypatch, tmp_path)
+    yield stub
+    stub.close()
+
+
+def test_resume_after_failed_page(stub, tmp_path):
+    work_dir = tmp_path / 'work'
+    stub.fail_page = 3
+
+    assert run_cli(work_dir) == 1
+    checkpoint = ingest.Checkpoint(str(work_dir))
+    assert [checkpoint.has_page(page) for page in range(1, 6)] == [True, True, False, False, False]
+    assert stub.pages_requested == [1, 2, 3, 3]  # la página 3 con sus dos intentos
+    assert app.cache.get(app.MONTHLY_CACHE_KEY) is None
+
+    stub.fail_page = None
+    stub.pages_requested.clear()
+    assert run_cli(work_dir) == 0
+    assert stub.pages_requested == [3, 4, 5]
+
+    published = app.cache.get(app.MONTHLY_CACHE_KEY)
+    assert published['total_events'] == TOTAL_EVENTS
+    assert sorted(event['id'] for event in published['events']) == list(range(1, TOTAL_EVENTS + 1))
+    assert app.cache.get(app.DATASET_VERSION_KEY) == published['version']
+    assert not work_dir.exists()  # checkpoints borrados después de publicar
+
+
+def test_missing_params_are_not_checkpointed(stub, tmp_path, monkeypatch):
+    work_dir = tmp_path / 'work'
+    monkeypatch.setattr(app, 'fetch_api_params', lambda: None)
+
+    assert run_cli(work_dir) == 1
+    assert not (work_dir / 'api_params.json').exists()
+    assert stub.pages_requested == []
+
+
+@pytest.mark.parametrize('allow_partial', [False, True])
+def test_incomplete_crawl_requires_allow_partial(monkeypatch, tmp_path, allow_partial):
+    # El upstream dice tener más eventos de los que entrega
+    stub = start_stub(monkeypatch, tmp_path, reported_total=TOTAL_EVENTS + 5)
+    try:
+        work_dir = tmp_path / 'work'
+        args = ['--allow-partial'] if allow_partial else []
+        assert run_cli(work_dir, *args) == (0 if allow_partial else 1)
+
+        published = app.cache.get(app.MONTHLY_CACHE_KEY)
+        if allow_partial:
+            assert published['total_events'] == TOTAL_EVENTS
+        else:
+            assert published is None
+            assert not ingest.Checkpoint(str(work_dir)).has_artifact('normalize')
+            assert ingest.Checkpoint(str(work_dir)).has_page(5)
+    finally:
+        stub.close()